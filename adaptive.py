@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import heapq
+import random
+import threading
+from functools import lru_cache
+from question_bank import load_question_bank, matches_style, DIFFICULTIES
+from storage import user_dir, write_json
+
+# Days until a question comes back for review, indexed by its Leitner box
+REVIEW_INTERVALS = [0, 1, 3, 7, 21, 60]
+PASS_SCORE = 7  # Scores at or above this promote a question to the next box
+MAX_REVIEW_SHARE = 0.5  # At most half of a session is review questions
+SECONDS_PER_DAY = 86400
+
+class AdaptiveSelector:
+    """Spaced-repetition question scheduler that leans towards a user's weak difficulty levels"""
+    def __init__(self):
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def _stats_file(self, user_id):
+        return os.path.join(user_dir(user_id), "adaptive.json")
+
+    def _load_user(self, user_id):
+        """Load a user's running statistics and build their due-date heaps (once)"""
+        if user_id not in self._users:
+            path = self._stats_file(user_id)
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    state = json.load(f)
+            else:
+                state = {"questions": {}, "difficulties": {}}
+
+            heaps = {}
+            for role, questions in state["questions"].items():
+                heap = [(q["due"], qid) for qid, q in questions.items()]
+                heapq.heapify(heap)
+                heaps[role] = heap
+            self._users[user_id] = (state, heaps)
+        return self._users[user_id]
+
+    def _difficulty_weight(self, state, role, difficulty):
+        """Sampling weight for a difficulty level; lower running averages weigh more"""
+        stats = state["difficulties"].get(role, {}).get(difficulty)
+        if not stats or not stats["n"]:
+            return 1.0
+        return (11 - stats["mean"]) / 5.5
+
+    def select(self, user_id, role, difficulty="Mixed", n=5, style="Standard"):
+        """Pick up to n questions: due reviews first, then new questions from weak areas
+        
+        Only questions in the interview style's pools are picked, topped up from the
+        standard pools when the style has too few.
+        """
+        bank = load_question_bank()
+        difficulties = DIFFICULTIES if difficulty == "Mixed" else [difficulty]
+        pools = {d: bank.get_pool(role, style, d) for d in difficulties}
+        pools = {d: pool for d, pool in pools.items() if pool}
+        if not any(bank.get_pool(role, "Standard", d) for d in difficulties):
+            return []
+
+        with self._lock:
+            state, heaps = self._load_user(user_id)
+            seen = state["questions"].get(role, {})
+            heap = heaps.get(role, [])
+            now = time.time()
+
+            selected = []
+            chosen = set()
+
+            # Due reviews come off the heap; entries whose due date changed since are stale
+            max_reviews = max(1, int(n * MAX_REVIEW_SHARE))
+            popped = []
+            pops = 0
+            while heap and heap[0][0] <= now and len(selected) < max_reviews and pops < n * 4:
+                due, qid = heapq.heappop(heap)
+                pops += 1
+                if qid not in seen or seen[qid]["due"] != due or qid in chosen:
+                    continue
+                popped.append((due, qid))
+                record = bank.get(qid)
+                if record and record["difficulty"] in pools and matches_style(record, style):
+                    selected.append(record)
+                    chosen.add(qid)
+            # Reviews stay scheduled until they are scored again
+            for entry in popped:
+                heapq.heappush(heap, entry)
+
+            # Fill the rest with unseen questions, weighting difficulty levels by weakness
+            levels = list(pools)
+            weights = [self._difficulty_weight(state, role, d) for d in levels]
+            attempts = 0
+            while levels and len(selected) < n and attempts < n * 20:
+                attempts += 1
+                record = random.choice(pools[random.choices(levels, weights=weights)[0]])
+                if record["id"] in chosen or record["id"] in seen:
+                    continue
+                selected.append(record)
+                chosen.add(record["id"])
+
+            # Everything nearby has been seen; fall back to any question not yet picked
+            if len(selected) < n:
+                remaining = [q for d in levels for q in pools[d] if q["id"] not in chosen]
+                selected.extend(random.sample(remaining, min(n - len(selected), len(remaining))))
+            if len(selected) < n and style != "Standard":
+                chosen.update(q["id"] for q in selected)
+                remaining = [q for d in difficulties for q in bank.get_pool(role, "Standard", d) if q["id"] not in chosen]
+                selected.extend(random.sample(remaining, min(n - len(selected), len(remaining))))
+
+        return selected
+
+    def record_session(self, user_id, session_data):
+        """Fold one finished session's scores into the running statistics"""
+        self.record_sessions(user_id, [session_data])
+
+    def record_sessions(self, user_id, sessions):
+        """Fold finished sessions' scores into the running statistics, with one write
+
+        Sessions carrying a save spool seq at or below the last one folded in are skipped.
+        """
+        with self._lock:
+            state, heaps = self._load_user(user_id)
+            for session_data in sessions:
+                seq = session_data.get('seq', 0)
+                if seq and seq <= state.get("applied_seq", 0):
+                    continue  # Folded in before its save was retried or replayed
+                self._add_session(state, heaps, session_data)
+                state["applied_seq"] = max(state.get("applied_seq", 0), seq)
+
+            # Replaced in one step: the file also holds applied_seq, which keeps replayed saves from counting twice
+            write_json(self._stats_file(user_id), state)
+
+    def _add_session(self, state, heaps, session_data):
+        """Fold one session's scores into a user's statistics and review heaps"""
+        role = session_data['role']
+        now = time.time()
+        seen = state["questions"].setdefault(role, {})
+        heap = heaps.setdefault(role, [])
+        levels = state["difficulties"].setdefault(role, {})
+
+        for q_data in session_data['questions']:
+            score = q_data.get('score')
+            if not score or 'id' not in q_data:
+                continue
+
+            stats = seen.setdefault(q_data['id'], {"n": 0, "mean": 0.0, "box": 0, "due": 0})
+            stats["n"] += 1
+            stats["mean"] += (score - stats["mean"]) / stats["n"]
+            if score >= PASS_SCORE:
+                stats["box"] = min(stats["box"] + 1, len(REVIEW_INTERVALS) - 1)
+            else:
+                stats["box"] = 0
+            stats["due"] = now + REVIEW_INTERVALS[stats["box"]] * SECONDS_PER_DAY
+            heapq.heappush(heap, (stats["due"], q_data['id']))
+
+            level = levels.setdefault(q_data.get('difficulty', 'Medium'), {"n": 0, "mean": 0.0})
+            level["n"] += 1
+            level["mean"] += (score - level["mean"]) / level["n"]
+
+@lru_cache(maxsize=None)
+def get_adaptive_selector():
+    """Shared selector (once per process): questions are picked and session results folded into the same statistics"""
+    return AdaptiveSelector()
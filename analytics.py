@@ -1,40 +1,395 @@
 import json
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
-from config import ANALYTICS_CONFIG
+import threading
+from config import ANALYTICS_CONFIG, STORAGE_CONFIG
+from storage import safe_user_id, user_dir, write_json
+from session_codec import append_sessions, read_sessions, iter_sessions
+from calibration import get_calibration_index
+from percentiles import get_percentile_index, ALL_DIFFICULTIES
+from duplicates import get_answer_index
+from search import get_search_index
+from write_behind import WriteBehindQueue
+from adaptive import get_adaptive_selector
+
+# Single-file store used before sessions were partitioned per user
+LEGACY_SESSIONS_FILE = "interview_sessions.json"
+
+TREND_GRANULARITIES = ['daily', 'weekly', 'monthly']
+
+def trend_bucket_key(day, granularity):
+    """Sortable bucket key for a date: 2024-03-05, 2024-W10 or 2024-03"""
+    if granularity == 'daily':
+        return day.isoformat()
+    if granularity == 'weekly':
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day.strftime('%Y-%m')
 
 class InterviewAnalytics:
-    def __init__(self):
-        self.sessions_file = "interview_sessions.json"
-        self.load_sessions()
-    
-    def load_sessions(self):
-        """Load existing interview sessions from file"""
-        if os.path.exists(self.sessions_file):
-            with open(self.sessions_file, 'r') as f:
-                self.sessions = json.load(f)
-        else:
-            self.sessions = []
-    
-    def save_session(self, session_data):
-        """Save a new interview session"""
+    def __init__(self, read_only=False):
+        self.partitions = {}  # user id -> that user's sessions, loaded on first access
+        self.rollups = {}  # user id -> running totals for the landing page
+        self.trends = {}  # user id -> daily/weekly/monthly score buckets
+        self._score_store = None
+        self._score_store_lock = threading.Lock()
+        self._lock = threading.RLock()  # Held while a batch is stored and while derived indexes are backfilled
+        # Saves are spooled and applied in the background; created last as it may replay spooled saves.
+        # Read-only instances (e.g. report workers in other processes) never touch the spool.
+        self.write_queue = None if read_only else WriteBehindQueue(
+            os.path.join(STORAGE_CONFIG['data_dir'], "spool"), self._apply_saves,
+            STORAGE_CONFIG['write_batch_size'], STORAGE_CONFIG['write_batch_window'],
+            STORAGE_CONFIG['write_max_attempts']
+        )
+    
+    @property
+    def score_store(self):
+        """Columnar score store, opened (and numpy imported) on first use; backfilled once from stored sessions if never built"""
+        with self._score_store_lock:
+            if self._score_store is None:
+                from score_store import ScoreStore
+                self._score_store = ScoreStore(os.path.join(STORAGE_CONFIG['data_dir'], "columns"))
+        store = self._score_store
+        if not store.built:
+            with self._lock:
+                if not store.built:
+                    store.rebuild(self.iter_all_sessions())
+        return store
+    
+    def _await_pending_saves(self):
+        """Let reads see every save acknowledged so far (no-op when nothing is queued or saves are failing)"""
+        if self.write_queue and self.write_queue.pending() and self.write_queue.last_error is None:
+            self.write_queue.flush(STORAGE_CONFIG['write_flush_timeout'])
+    
+    def _sessions_file(self, user_id):
+        return os.path.join(user_dir(user_id), "sessions.bin")
+    
+    def _json_sessions_file(self, user_id):
+        return os.path.join(user_dir(user_id), "sessions.json")
+    
+    def _rollup_file(self, user_id):
+        return os.path.join(user_dir(user_id), "rollup.json")
+    
+    def _trends_file(self, user_id):
+        return os.path.join(user_dir(user_id), "trends.json")
+    
+    def load_sessions(self, user_id=None):
+        """Load a user's interview sessions from their partition file"""
+        self._await_pending_saves()
+        return self._load_partition(safe_user_id(user_id))
+    
+    def _load_partition(self, user_id):
+        """A user's stored sessions, without waiting for queued saves"""
+        if user_id not in self.partitions:
+            sessions_file = self._sessions_file(user_id)
+            json_sessions_file = self._json_sessions_file(user_id)
+            if os.path.exists(sessions_file):
+                # Metrics and history never need answer text, so answers stay compressed on disk
+                self.partitions[user_id] = read_sessions(sessions_file, include_answers=False)
+            elif os.path.exists(json_sessions_file):
+                # Partition saved as JSON before the binary format
+                with open(json_sessions_file, 'r') as f:
+                    self.partitions[user_id] = json.load(f)
+            elif user_id == STORAGE_CONFIG['default_user'] and os.path.exists(LEGACY_SESSIONS_FILE):
+                # Sessions saved before partitioning belong to the default user
+                with open(LEGACY_SESSIONS_FILE, 'r') as f:
+                    self.partitions[user_id] = json.load(f)
+            else:
+                self.partitions[user_id] = []
+        return self.partitions[user_id]
+    
+    def stored_user_ids(self):
+        """Ids of every user with a partition (plus the default user if the legacy store exists)"""
+        users_dir = os.path.join(STORAGE_CONFIG['data_dir'], 'users')
+        user_ids = sorted(os.listdir(users_dir)) if os.path.isdir(users_dir) else []
+        if STORAGE_CONFIG['default_user'] not in user_ids and os.path.exists(LEGACY_SESSIONS_FILE):
+            user_ids.append(STORAGE_CONFIG['default_user'])
+        return user_ids
+    
+    def iter_all_sessions(self, include_answers=False):
+        """Stream every stored session of every user, one partition file at a time"""
+        for user_id in self.stored_user_ids():
+            sessions_file = self._sessions_file(user_id)
+            if os.path.exists(sessions_file):
+                yield from iter_sessions(sessions_file, include_answers)
+            else:
+                # JSON partitions predate the binary format and are small; load them whole
+                for session_data in self._load_partition(user_id):
+                    yield dict(session_data, user_id=session_data.get('user_id') or user_id)
+    
+    def get_calibration(self):
+        """Per-question difficulty calibration; backfilled once from stored sessions if never built"""
+        index = get_calibration_index()
+        # Picks up a recalibration (python calibration.py) before this process saves over it
+        index.reload_if_changed()
+        if not index.on_disk:
+            # Backfills run under the store lock, so a batch being stored is counted exactly once
+            with self._lock:
+                if not index.on_disk:
+                    index.rebuild(self.iter_all_sessions())
+                    index.save()
+        return index
+    
+    def get_percentiles(self):
+        """Cohort score distributions; backfilled once from stored sessions if never built"""
+        index = get_percentile_index()
+        if not index.on_disk:
+            with self._lock:
+                if not index.on_disk:
+                    index.rebuild(self.iter_all_sessions())
+                    index.save()
+        return index
+    
+    def get_answer_index(self):
+        """LSH index of stored answers; backfilled once from stored sessions if never built"""
+        index = get_answer_index()
+        if index.is_new:
+            with self._lock:
+                if index.is_new:
+                    index.rebuild(self.iter_all_sessions(include_answers=True))
+        return index
+    
+    def get_search_index(self):
+        """Full-text index of stored answers; backfilled once from stored sessions if never built"""
+        index = get_search_index()
+        if index.is_new:
+            with self._lock:
+                if index.is_new:
+                    index.rebuild(self.iter_all_sessions(include_answers=True))
+        return index
+    
+    def search_answers(self, query, user_id=None, role=None, difficulty=None, min_score=None, max_score=None, page=0):
+        """Search a user's stored answers and questions (boolean and "phrase" queries), one page at a time"""
+        self._await_pending_saves()
+        return self.get_search_index().search(
+            query, safe_user_id(user_id), role, difficulty, min_score, max_score, page
+        )
+    
+    def session_percentiles(self, session_data):
+        """How a session's average scores rank in its role's cohorts, overall and per difficulty"""
+        index = self.get_percentiles()
+        by_difficulty = {}
+        for q_data in session_data['questions']:
+            if q_data.get('score'):
+                by_difficulty.setdefault(q_data.get('difficulty'), []).append(q_data['score'])
+                by_difficulty.setdefault(ALL_DIFFICULTIES, []).append(q_data['score'])
+        
+        rankings = []
+        for difficulty, scores in by_difficulty.items():
+            average = sum(scores) / len(scores)
+            rank = index.session_percentile(session_data['role'], difficulty, average)
+            if rank:
+                rankings.append({'difficulty': difficulty, 'average': average, **rank})
+        order = [ALL_DIFFICULTIES, 'Easy', 'Medium', 'Hard']
+        return sorted(rankings, key=lambda rank: order.index(rank['difficulty']) if rank['difficulty'] in order else len(order))
+    
+    def save_session(self, session_data, user_id=None):
+        """Queue a new interview session for saving to the user's partition
+        
+        Returns once the session is in the durable spool; the writer thread stores it.
+        """
+        session_data['user_id'] = safe_user_id(user_id or session_data.get('user_id'))
         session_data['timestamp'] = datetime.now().isoformat()
-        session_data['session_id'] = len(self.sessions) + 1
-        self.sessions.append(session_data)
+        # The writer gets its own copy; the caller may keep using session_data
+        self.write_queue.submit(dict(session_data))
+    
+    def _apply_saves(self, batch):
+        """Store a batch of queued (seq, session) pairs with one append and one rollup/trends write per user
+        
+        Every store records the last spool seq it applied and skips sessions at or below it,
+        so a batch that is retried after an error, or replayed after a crash, is stored once.
+        """
+        by_user = {}
+        for seq, session_data in batch:
+            session_data['seq'] = seq
+            by_user.setdefault(session_data['user_id'], []).append(session_data)
+        sessions = [session_data for _, session_data in batch]
+        
+        with self._lock:
+            # Derived indexes are backfilled before this batch is stored, so it is counted once
+            calibration = self.get_calibration()
+            percentiles = self.get_percentiles()
+            answer_index = self.get_answer_index()
+            search_index = self.get_search_index()
+            score_store = self.score_store
+            for user_id, user_sessions in by_user.items():
+                self._store_user_sessions(user_id, user_sessions)
+            
+            score_store.append_sessions(self._unapplied(score_store, sessions))
+            calibration.add_sessions(self._unapplied(calibration, sessions))
+            calibration.save()
+            percentiles.add_sessions(self._unapplied(percentiles, sessions))
+            percentiles.save()
+            answer_index.add_sessions(self._unapplied(answer_index, sessions))
+            search_index.add_sessions(self._unapplied(search_index, sessions))
+    
+    def _unapplied(self, store, sessions):
+        """The sessions a store has not applied yet"""
+        return [session_data for session_data in sessions if session_data['seq'] > store.applied_seq]
+    
+    def _store_user_sessions(self, user_id, user_sessions):
+        """Append a user's queued sessions to their partition and fold them into their rollup, trends and adaptive statistics"""
+        sessions = self._load_partition(user_id)
+        # Derived views are backfilled before these sessions are appended
+        rollup = self.get_rollup(user_id)
+        trends = self.get_trends(user_id)
+        
+        # The partition's last session carries the seq of the last save appended to it
+        stored_seq = sessions[-1].get('seq', 0) if sessions else 0
+        new_sessions = [session_data for session_data in user_sessions if session_data['seq'] > stored_seq]
+        for i, session_data in enumerate(new_sessions):
+            session_data['session_id'] = len(sessions) + i + 1
+        sessions_file = self._sessions_file(user_id)
+        if sessions and not os.path.exists(sessions_file):
+            # Sessions loaded from a JSON store are converted first, in one step
+            if os.path.exists(sessions_file + ".tmp"):
+                os.remove(sessions_file + ".tmp")
+            append_sessions(sessions_file + ".tmp", sessions)
+            os.replace(sessions_file + ".tmp", sessions_file)
+        append_sessions(sessions_file, new_sessions)
+        sessions.extend(new_sessions)
+        
+        # Running totals are updated in memory and rewritten whole, so a retry only repeats the write
+        for session_data in user_sessions:
+            metrics = self.generate_performance_metrics(session_data)
+            if session_data['seq'] > rollup.get('applied_seq', 0):
+                self._add_to_rollup(rollup, session_data, metrics)
+            if session_data['seq'] > trends.get('applied_seq', 0):
+                self._add_to_trends(trends, session_data, metrics)
+        write_json(self._rollup_file(user_id), rollup)
+        write_json(self._trends_file(user_id), trends)
+        get_adaptive_selector().record_sessions(user_id, user_sessions)
+    
+    def query_scores(self, role=None, difficulty=None, days=None, user_id=None, rubric=None):
+        """Count, mean and histogram of question scores across all users, from the columnar store"""
+        self._await_pending_saves()
+        since = (datetime.now() - timedelta(days=days)).timestamp() if days else None
+        return self.score_store.summary(role=role, difficulty=difficulty, since=since, user_id=user_id, rubric=rubric)
+    
+    def average_by_difficulty(self, role=None, days=None, user_id=None):
+        """Mean question score per difficulty level, from the columnar store"""
+        self._await_pending_saves()
+        since = (datetime.now() - timedelta(days=days)).timestamp() if days else None
+        return self.score_store.mean_by('difficulty', role=role, since=since, user_id=user_id)
+    
+    def time_per_question(self, role=None, days=None, user_id=None):
+        """Time spent per question (overall percentiles and mean per difficulty), from the columnar store"""
+        self._await_pending_saves()
+        since = (datetime.now() - timedelta(days=days)).timestamp() if days else None
+        filters = {'role': role, 'since': since, 'user_id': user_id}
+        return {
+            'overall': self.score_store.timing(**filters),
+            'by_difficulty': self.score_store.mean_by('difficulty', 'seconds', **filters)
+        }
+    
+    def get_rollup(self, user_id=None):
+        """Get a user's running totals (sessions, scores, questions, per-role counts)"""
+        user_id = safe_user_id(user_id)
+        self._await_pending_saves()
+        if user_id not in self.rollups:
+            rollup_file = self._rollup_file(user_id)
+            if os.path.exists(rollup_file):
+                with open(rollup_file, 'r') as f:
+                    self.rollups[user_id] = json.load(f)
+            else:
+                # First access for this user: backfill once from any existing sessions
+                self.rollups[user_id] = self._empty_rollup()
+                for session in self.load_sessions(user_id):
+                    self._add_to_rollup(self.rollups[user_id], session, self.generate_performance_metrics(session))
+        return self.rollups[user_id]
+    
+    def _empty_rollup(self):
+        return {
+            'total_sessions': 0,
+            'scored_sessions': 0,
+            'score_sum': 0.0,
+            'total_questions': 0,
+            'answered_questions': 0,
+            'roles': {}
+        }
+    
+    def _add_to_rollup(self, rollup, session_data, metrics):
+        """Add one session to running totals in O(1) of history size"""
+        role_totals = rollup['roles'].setdefault(session_data.get('role', ''), {
+            'sessions': 0, 'scored_sessions': 0, 'score_sum': 0.0, 'questions': 0
+        })
+        
+        rollup['applied_seq'] = session_data.get('seq', 0)
+        rollup['total_sessions'] += 1
+        rollup['total_questions'] += len(session_data['questions'])
+        role_totals['sessions'] += 1
+        role_totals['questions'] += len(session_data['questions'])
+        if metrics:
+            rollup['scored_sessions'] += 1
+            rollup['score_sum'] += metrics['average_score']
+            rollup['answered_questions'] += metrics['answered_questions']
+            role_totals['scored_sessions'] += 1
+            role_totals['score_sum'] += metrics['average_score']
+    
+    def get_trends(self, user_id=None):
+        """Get a user's pre-aggregated score buckets for every granularity"""
+        user_id = safe_user_id(user_id)
+        self._await_pending_saves()
+        if user_id not in self.trends:
+            trends_file = self._trends_file(user_id)
+            if os.path.exists(trends_file):
+                with open(trends_file, 'r') as f:
+                    self.trends[user_id] = json.load(f)
+            else:
+                # First access for this user: backfill once from any existing sessions
+                self.trends[user_id] = {granularity: {} for granularity in TREND_GRANULARITIES}
+                for session in self.load_sessions(user_id):
+                    self._add_to_trends(self.trends[user_id], session, self.generate_performance_metrics(session))
+        return self.trends[user_id]
+    
+    def _add_to_trends(self, trends, session_data, metrics):
+        """Add one scored session to its day, week and month buckets"""
+        trends['applied_seq'] = session_data.get('seq', 0)
+        if not metrics:
+            return
+        day = datetime.fromisoformat(session_data['timestamp']).date()
+        for granularity in TREND_GRANULARITIES:
+            bucket = trends[granularity].setdefault(trend_bucket_key(day, granularity), {
+                'sessions': 0, 'avg_sum': 0.0, 'weighted_sum': 0.0
+            })
+            bucket['sessions'] += 1
+            bucket['avg_sum'] += metrics['average_score']
+            bucket['weighted_sum'] += metrics['weighted_score']
+    
+    def get_trend(self, user_id=None, granularity='weekly', start=None, end=None):
+        """Get average scores per bucket between two dates (inclusive), oldest first"""
+        buckets = self.get_trends(user_id)[granularity]
+        start_key = trend_bucket_key(start, granularity) if start else None
+        end_key = trend_bucket_key(end, granularity) if end else None
         
-        with open(self.sessions_file, 'w') as f:
-            json.dump(self.sessions, f, indent=2)
+        trend = []
+        for key in sorted(buckets):
+            if (start_key and key < start_key) or (end_key and key > end_key):
+                continue
+            bucket = buckets[key]
+            trend.append({
+                'period': key,
+                'sessions': bucket['sessions'],
+                'avg_score': bucket['avg_sum'] / bucket['sessions'],
+                'weighted_score': bucket['weighted_sum'] / bucket['sessions']
+            })
+        return trend
+
     
-    def calculate_weighted_score(self, scores, difficulties):
-        """Calculate weighted score based on difficulty levels"""
+    def calculate_weighted_score(self, scores, difficulties, question_ids=None):
+        """Calculate weighted score based on difficulty levels
+        
+        With question ids, each question is weighted by its calibrated (empirical) difficulty.
+        """
         total_weighted = 0
         total_weight = 0
+        calibration = get_calibration_index()
         
-        for score, difficulty in zip(scores, difficulties):
-            weight = ANALYTICS_CONFIG['difficulty_weighting'].get(difficulty, 1.0)
+        for score, difficulty, question_id in zip(scores, difficulties, question_ids or [None] * len(scores)):
+            if question_id:
+                weight = calibration.difficulty_weight(question_id, difficulty)
+            else:
+                weight = ANALYTICS_CONFIG['difficulty_weighting'].get(difficulty, 1.0)
             total_weighted += score * weight
             total_weight += weight
         
@@ -44,11 +399,13 @@ class InterviewAnalytics:
         """Generate detailed performance metrics for a session"""
         scores = []
         difficulties = []
+        question_ids = []
         
         for q_data in session_data['questions']:
             if 'score' in q_data and q_data['score']:
                 scores.append(q_data['score'])
                 difficulties.append(q_data.get('difficulty', 'Medium'))
+                question_ids.append(q_data.get('id'))
         
         if not scores:
             return None
@@ -57,7 +414,7 @@ class InterviewAnalytics:
             'total_questions': len(session_data['questions']),
             'answered_questions': len(scores),
             'average_score': sum(scores) / len(scores),
-            'weighted_score': self.calculate_weighted_score(scores, difficulties),
+            'weighted_score': self.calculate_weighted_score(scores, difficulties, question_ids),
             'highest_score': max(scores),
             'lowest_score': min(scores),
             'score_range': max(scores) - min(scores),
@@ -91,8 +448,8 @@ class InterviewAnalytics:
                 improvements.append(f"Needs improvement on: {q_data['question'][:50]}...")
         return improvements[:3]  # Top 3 improvements
     
-    def create_performance_chart(self, session_data):
-        """Create a performance chart for the session"""
+    def performance_chart_data(self, session_data):
+        """Question labels and scores plotted by the performance chart"""
         scores = []
         question_labels = []
         
@@ -101,9 +458,15 @@ class InterviewAnalytics:
                 scores.append(q_data['score'])
                 question_labels.append(f"Q{i+1}")
         
+        return question_labels, scores
+    
+    def create_performance_chart(self, session_data):
+        """Create a performance chart for the session"""
+        question_labels, scores = self.performance_chart_data(session_data)
         if not scores:
             return None
         
+        import plotly.graph_objects as go
         fig = go.Figure()
         fig.add_trace(go.Scatter(
             x=question_labels,
@@ -124,8 +487,8 @@ class InterviewAnalytics:
         
         return fig
     
-    def create_difficulty_chart(self, session_data):
-        """Create a chart showing performance by difficulty"""
+    def difficulty_chart_data(self, session_data):
+        """Average score per difficulty level plotted by the difficulty chart"""
         difficulty_scores = {'Easy': [], 'Medium': [], 'Hard': []}
         
         for q_data in session_data['questions']:
@@ -140,9 +503,15 @@ class InterviewAnalytics:
             if scores:
                 avg_scores[diff] = sum(scores) / len(scores)
         
+        return avg_scores
+    
+    def create_difficulty_chart(self, session_data):
+        """Create a chart showing performance by difficulty"""
+        avg_scores = self.difficulty_chart_data(session_data)
         if not avg_scores:
             return None
         
+        import plotly.express as px
         fig = px.bar(
             x=list(avg_scores.keys()),
             y=list(avg_scores.values()),
@@ -155,13 +524,14 @@ class InterviewAnalytics:
         fig.update_layout(height=400)
         return fig
     
-    def get_session_history(self):
-        """Get summary of all interview sessions"""
-        if not self.sessions:
+    def get_session_history(self, user_id=None):
+        """Get summary of a user's interview sessions"""
+        sessions = self.load_sessions(user_id)
+        if not sessions:
             return None
         
         history = []
-        for session in self.sessions[-10:]:  # Last 10 sessions
+        for session in sessions[-10:]:  # Last 10 sessions
             metrics = self.generate_performance_metrics(session)
             if metrics:
                 history.append({
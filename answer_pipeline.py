@@ -0,0 +1,32 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+# Words made of letters/digits, keeping joined forms like "cross-validation" or "a/b"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['/-][a-z0-9]+)*")
+
+TECH_DEPTH_TERMS = {
+    'algorithm', 'optimization', 'architecture', 'design', 'pattern',
+    'framework', 'api', 'database', 'testing', 'performance'
+}
+
+class AnswerFeatures:
+    """Normalized text, tokens and counts for one answer"""
+    __slots__ = ('raw', 'text', 'tokens', 'token_counts', 'word_count', 'char_count')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.text = raw.lower()
+        self.tokens = tuple(TOKEN_PATTERN.findall(self.text))
+        self.token_counts = Counter(self.tokens)
+        self.word_count = len(raw.split())
+        self.char_count = len(raw)
+
+@lru_cache(maxsize=1024)
+def preprocess_answer(text):
+    """Preprocess an answer once; repeated signals on the same text hit the cache"""
+    return AnswerFeatures(text or "")
+
+def count_tech_terms(features):
+    """Number of distinct general technical terms used in the answer"""
+    return sum(1 for term in TECH_DEPTH_TERMS if term in features.token_counts)
@@ -1,16 +1,34 @@
+import time
 import streamlit as st
-from interview_bot import get_questions_for_session, evaluate_answer, extract_score_from_feedback, get_follow_up_question
+from interview_bot import get_questions_for_session, record_session_results, get_question_hint, score_answer, render_feedback, analyze_answer, get_evaluation_follow_up, get_follow_up_text, score_follow_up
+from question_bank import load_question_bank, INTERVIEW_STYLES
 from analytics import InterviewAnalytics
-from config import BRAND_CONFIG, ANALYTICS_CONFIG, VOICE_CONFIG, INTERVIEW_CONFIG
+from storage import safe_user_id
+from session_store import SessionStore
+from follow_ups import FollowUpThread
+from event_log import ANSWER_STARTED, EVALUATED, NEXT, PREVIOUS, SKIPPED, FINISHED
+from theme import publish_theme_css, THEME_CSS_FILE
+from config import BRAND_CONFIG, ANALYTICS_CONFIG, VOICE_CONFIG, INTERVIEW_CONFIG, STORAGE_CONFIG, PERFORMANCE_CONFIG, FEEDBACK_CONFIG
 import json
 import random
-import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime
-import pandas as pd
+from datetime import datetime, timedelta
 
-# Initialize analytics
-analytics = InterviewAnalytics()
+# Server CPU time of this script run; fragments reruns are measured separately
+run_cpu_start = time.thread_time()
+
+# Initialize analytics once per server process; user partitions load on demand
+@st.cache_resource
+def get_analytics():
+    return InterviewAnalytics()
+
+analytics = get_analytics()
+
+# Interview states live server-side, shared by all sessions; st.session_state only keeps a token
+@st.cache_resource
+def get_session_store():
+    return SessionStore(INTERVIEW_CONFIG['session_idle_timeout'])
+
+session_store = get_session_store()
 
 # --- Helper Functions ---
 def get_role_avatar(role):
@@ -37,6 +55,62 @@ def get_difficulty_text_color(difficulty):
     else:
         return "#ffffff"  # White text for other backgrounds
 
+def record_cpu_time(label, started):
+    """Keep the last few server CPU timings (ms) of a page or fragment run"""
+    samples = st.session_state.setdefault('cpu_samples', {}).setdefault(label, [])
+    samples.append((time.thread_time() - started) * 1000)
+    del samples[:-20]
+
+def show_cpu_metrics():
+    """Sidebar readout of the recorded CPU timings"""
+    with st.sidebar:
+        st.markdown("### ⏱️ Server CPU per Run")
+        for label, samples in st.session_state.get('cpu_samples', {}).items():
+            st.metric(label, f"{samples[-1]:.1f} ms", help=f"Mean of last {len(samples)}: {sum(samples) / len(samples):.1f} ms")
+
+def show_memory_metrics():
+    """Sidebar readout of interview state memory"""
+    stats = session_store.stats()
+    interview = get_interview()
+    with st.sidebar:
+        st.markdown("### 🧠 Interview State Memory")
+        st.metric("Per Session", f"{stats['bytes_per_session'] / 1024:.1f} KB", help=f"{stats['sessions']} live interviews, {stats['total_bytes'] / 1024:.1f} KB in total")
+        if interview:
+            st.metric("This Session", f"{interview.footprint() / 1024:.1f} KB")
+
+def get_interview():
+    """The current interview's state, or None if there is none or it was evicted while idle"""
+    token = st.session_state.get('interview_token')
+    return session_store.get(token) if token else None
+
+def end_interview():
+    """Drop the current interview's state and every per-interview key"""
+    session_store.discard(st.session_state.get('interview_token'))
+    for key in list(st.session_state.keys()):
+        if key in ('page', 'interview_token', 'start_time') or key.startswith(('answer_', 'follow_up_')):
+            del st.session_state[key]
+
+def question_time_up(interview, current_q):
+    """Whether the current question's time limit ran out (recorded once in the interview's time_up set)
+    
+    From then on the stored answer is frozen as it stood at the deadline; edits sent later are ignored.
+    """
+    if not st.session_state.get('time_limit', False):
+        return False
+    if current_q in interview.time_up:
+        return True
+    if (interview.question_seconds()[current_q] or 0) < INTERVIEW_CONFIG['time_limit_per_question']:
+        return False
+    interview.mark_time_up(current_q)
+    return True
+
+def interview_expired():
+    """Tell the user their interview was evicted and offer a way back"""
+    st.info(f"This interview expired after {INTERVIEW_CONFIG['session_idle_timeout'] // 60} minutes of inactivity. Please start a new session.")
+    if st.button("Back to Landing"):
+        end_interview()
+        st.rerun()
+
 # --- Streamlit Page Config ---
 st.set_page_config(
     page_title=BRAND_CONFIG["company_name"],
@@ -46,186 +120,29 @@ st.set_page_config(
 )
 
 # --- Custom CSS with Branding ---
-st.markdown(f"""
-<style>
-    .main-header {{ 
-        font-size: 3rem; 
-        font-weight: bold; 
-        text-align: center; 
-        color: {BRAND_CONFIG["primary_color"]}; 
-        margin-bottom: 2rem; 
-    }}
-    .sub-header {{ 
-        font-size: 1.5rem; 
-        color: #2c3e50; 
-        margin-bottom: 1rem; 
-    }}
-    .chat-bubble {{ 
-        border-radius: 18px; 
-        padding: 1rem; 
-        margin: 0.5rem 0; 
-        max-width: 80%; 
-    }}
-    .chat-bubble.user {{ 
-        background: #e3f2fd; 
-        margin-left: auto; 
-        text-align: right; 
-    }}
-    .chat-bubble.bot {{ 
-        background: #f0f8ff; 
-        margin-right: auto; 
-        text-align: left; 
-        border-left: 5px solid {BRAND_CONFIG["primary_color"]}; 
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }}
-    .avatar {{ 
-        font-size: 2rem; 
-        vertical-align: middle; 
-        margin-right: 0.5rem; 
-    }}
-    .progress-bar {{ 
-        height: 20px; 
-        background: #e9ecef; 
-        border-radius: 10px; 
-        overflow: hidden; 
-        margin-bottom: 1rem; 
-    }}
-    .progress {{ 
-        height: 100%; 
-        background: {BRAND_CONFIG["primary_color"]}; 
-        transition: width 0.3s; 
-    }}
-    .feedback-box {{ 
-        background: linear-gradient(135deg, #e8f5e8 0%, #f0f8f0 100%); 
-        border-left: 5px solid {BRAND_CONFIG["accent_color"]}; 
-        border-radius: 10px; 
-        padding: 1rem; 
-        margin: 1rem 0; 
-        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-    }}
-    .difficulty-badge {{
-        padding: 0.25rem 0.75rem;
-        border-radius: 20px;
-        font-size: 0.85rem;
-        font-weight: bold;
-        display: inline-block;
-        margin-left: 0.5rem;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        border: 2px solid rgba(255,255,255,0.3);
-    }}
-    .summary-box {{ 
-        background: #f1f8e9; 
-        border-left: 5px solid {BRAND_CONFIG["accent_color"]}; 
-        border-radius: 10px; 
-        padding: 1.5rem; 
-        margin: 2rem 0; 
-    }}
-    .stButton > button {{ 
-        width: 100%; 
-        background: {BRAND_CONFIG["primary_color"]}; 
-        color: white; 
-        border-radius: 10px; 
-        padding: 0.5rem 1rem; 
-        font-weight: bold; 
-    }}
-    .stButton > button:hover {{ 
-        background: {BRAND_CONFIG["secondary_color"]}; 
-    }}
-    .voice-button {{
-        background: {BRAND_CONFIG["secondary_color"]} !important;
-    }}
-    .role-header h3 {{
-        margin-bottom: 0.5rem;
-    }}
-    .role-header .difficulty-badge {{
-        margin-left: 1rem;
-    }}
-    .feedback-box.animated {{
-        animation: fadeIn 0.5s ease-out;
-    }}
-    @keyframes fadeIn {{
-        from {{ opacity: 0; }}
-        to {{ opacity: 1; }}
-    }}
-    .follow-up {{
-        border-left: 5px solid {BRAND_CONFIG["primary_color"]} !important;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }}
-    .feature-showcase {{
-        background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%);
-        border-radius: 15px;
-        padding: 2rem;
-        margin: 2rem 0;
-        text-align: center;
-        box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-    }}
-    .feature-showcase h2 {{
-        color: {BRAND_CONFIG["primary_color"]};
-        margin-bottom: 1rem;
-    }}
-    .quick-stats {{
-        background: linear-gradient(135deg, #e3f2fd 0%, #bbdefb 100%);
-        border-radius: 10px;
-        padding: 1.5rem;
-        margin: 1rem 0;
-        border-left: 5px solid {BRAND_CONFIG["accent_color"]};
-    }}
-    .hint-box {{
-        background: linear-gradient(135deg, #fff3e0 0%, #ffe0b2 100%);
-        border-left: 5px solid #ff9800;
-        border-radius: 10px;
-        padding: 1rem;
-        margin: 1rem 0;
-        animation: slideIn 0.3s ease-out;
-    }}
-    @keyframes slideIn {{
-        from {{ transform: translateX(-20px); opacity: 0; }}
-        to {{ transform: translateX(0); opacity: 1; }}
-    }}
-    .confidence-indicator {{
-        background: linear-gradient(90deg, #ff6b6b 0%, #ffd93d 50%, #6bcf7f 100%);
-        height: 8px;
-        border-radius: 4px;
-        margin: 0.5rem 0;
-    }}
-    .tech-depth-bar {{
-        background: linear-gradient(90deg, #4fc3f7 0%, #29b6f6 100%);
-        height: 8px;
-        border-radius: 4px;
-        margin: 0.5rem 0;
-    }}
-</style>
-""", unsafe_allow_html=True)
+# Generated once per BRAND_CONFIG and served as a static, browser-cached stylesheet
+@st.cache_resource
+def get_theme_stylesheet(brand_items):
+    version = publish_theme_css(dict(brand_items))
+    return f'<link rel="stylesheet" href="app/static/{THEME_CSS_FILE}?v={version}">'
+
+st.markdown(get_theme_stylesheet(tuple(sorted(BRAND_CONFIG.items()))), unsafe_allow_html=True)
 
 # --- Session State Initialization ---
 if 'page' not in st.session_state:
     st.session_state['page'] = 'landing'
-if 'role' not in st.session_state:
-    st.session_state['role'] = None
-if 'difficulty' not in st.session_state:
-    st.session_state['difficulty'] = 'Mixed'
-if 'questions' not in st.session_state:
-    st.session_state['questions'] = []
-if 'answers' not in st.session_state:
-    st.session_state['answers'] = []
-if 'feedbacks' not in st.session_state:
-    st.session_state['feedbacks'] = []
-if 'scores' not in st.session_state:
-    st.session_state['scores'] = []
-if 'current_q' not in st.session_state:
-    st.session_state['current_q'] = 0
-if 'follow_ups' not in st.session_state:
-    st.session_state['follow_ups'] = []
+if 'interview_token' not in st.session_state:
+    st.session_state['interview_token'] = None
 if 'voice_enabled' not in st.session_state:
     st.session_state['voice_enabled'] = VOICE_CONFIG['enable_voice']
-if 'interview_style' not in st.session_state:
-    st.session_state['interview_style'] = 'Standard'
 if 'show_hints' not in st.session_state:
     st.session_state['show_hints'] = True
 if 'time_limit' not in st.session_state:
     st.session_state['time_limit'] = False
 if 'strict_mode' not in st.session_state:
     st.session_state['strict_mode'] = False
+if 'user_id' not in st.session_state:
+    st.session_state['user_id'] = STORAGE_CONFIG['default_user']
 
 # --- Landing Page ---
 def landing_page():
@@ -263,34 +180,34 @@ def landing_page():
         - **Downloadable Reports** for portfolio building
         """)
     
+    # Candidate identity; sessions and stats are kept per candidate
+    user_id = st.text_input("Candidate ID:", value=st.session_state['user_id'], key='user_id_input')
+    st.session_state['user_id'] = safe_user_id(user_id)
+    
     # Quick stats if available
     if ANALYTICS_CONFIG['save_sessions']:
         try:
-            history = analytics.get_session_history()
-            if history:
+            rollup = analytics.get_rollup(st.session_state['user_id'])
+            if rollup['total_sessions']:
                 st.markdown("---")
                 st.markdown("### 📈 **Your Learning Journey**")
                 col1, col2, col3, col4 = st.columns(4)
                 with col1:
-                    st.metric("Total Sessions", len(history))
+                    st.metric("Total Sessions", rollup['total_sessions'])
                 with col2:
-                    avg_score = sum(session.get('average_score', 0) for session in history) / len(history)
+                    avg_score = rollup['score_sum'] / rollup['scored_sessions'] if rollup['scored_sessions'] else 0
                     st.metric("Avg Score", f"{avg_score:.1f}/10")
                 with col3:
-                    total_questions = sum(session.get('total_questions', 0) for session in history)
-                    st.metric("Questions Practiced", total_questions)
+                    st.metric("Questions Practiced", rollup['total_questions'])
                 with col4:
-                    roles_practiced = len(set(session.get('role', '') for session in history))
-                    st.metric("Roles Explored", roles_practiced)
+                    st.metric("Roles Explored", len(rollup['roles']))
         except:
             pass
     
     st.markdown("---")
     
     with st.form("start_form"):
-        with open("question_bank.json") as f:
-            question_bank = json.load(f)
-        roles = list(question_bank.keys())
+        roles = load_question_bank().roles
         
         col1, col2 = st.columns(2)
         with col1:
@@ -299,7 +216,7 @@ def landing_page():
         
         with col2:
             n_questions = st.slider("Number of Questions:", 3, INTERVIEW_CONFIG["max_questions"], INTERVIEW_CONFIG["default_questions"])
-            interview_style = st.selectbox("Interview Style:", ["Standard", "Behavioral Focus", "Technical Deep Dive", "System Design", "Quick Fire"])
+            interview_style = st.selectbox("Interview Style:", INTERVIEW_STYLES)
         
         # Advanced options
         with st.expander("⚙️ Advanced Options"):
@@ -313,21 +230,16 @@ def landing_page():
         
         submitted = st.form_submit_button("🚀 Start Interview")
         if submitted:
-            questions = get_questions_for_session(role, difficulty, n_questions)
+            questions = get_questions_for_session(role, difficulty, n_questions, user_id=st.session_state['user_id'], style=interview_style)
             
             if not questions:
                 st.error(f"No questions available for {role} with {difficulty} difficulty. Please try a different combination.")
                 return
             
-            st.session_state['role'] = role
-            st.session_state['difficulty'] = difficulty
-            st.session_state['interview_style'] = interview_style
-            st.session_state['questions'] = questions
-            st.session_state['answers'] = [""] * len(questions)
-            st.session_state['feedbacks'] = [None] * len(questions)
-            st.session_state['scores'] = [None] * len(questions)
-            st.session_state['follow_ups'] = [None] * len(questions)
-            st.session_state['current_q'] = 0
+            end_interview()
+            st.session_state['interview_token'] = session_store.create(
+                st.session_state['user_id'], role, difficulty, interview_style, [q["id"] for q in questions]
+            )
             st.session_state['voice_enabled'] = voice_enabled
             st.session_state['show_hints'] = show_hints
             st.session_state['time_limit'] = time_limit
@@ -337,72 +249,55 @@ def landing_page():
 
 # --- Interview Page ---
 def interview_page():
-    # Get session state variables with safety checks
-    role = st.session_state.get('role', 'Developer')
-    difficulty = st.session_state.get('difficulty', 'Medium')
-    interview_style = st.session_state.get('interview_style', 'Standard')
-    questions = st.session_state.get('questions', [])
-    answers = st.session_state.get('answers', [])
-    feedbacks = st.session_state.get('feedbacks', [])
-    scores = st.session_state.get('scores', [])
-    follow_ups = st.session_state.get('follow_ups', [])
-    current_q = st.session_state.get('current_q', 0)
+    interview = get_interview()
+    if interview is None:
+        interview_expired()
+        return
+    
+    # Get interview state with safety checks
+    role = interview.role
+    interview_style = interview.style
     show_hints = st.session_state.get('show_hints', True)
     time_limit = st.session_state.get('time_limit', False)
     strict_mode = st.session_state.get('strict_mode', False)
     
     # Safety checks
-    if not questions:
+    if not interview.question_ids:
         st.error("No questions available. Please start a new interview session.")
         if st.button("Back to Landing"):
-            st.session_state['page'] = 'landing'
+            end_interview()
             st.rerun()
         return
     
-    n_questions = len(questions)
+    n_questions = len(interview.question_ids)
     
     # Ensure current_q is within bounds
-    if current_q >= n_questions:
-        current_q = n_questions - 1
-        st.session_state['current_q'] = current_q
-    
-    # Ensure all arrays are the right length
-    while len(answers) < n_questions:
-        answers.append("")
-    while len(feedbacks) < n_questions:
-        feedbacks.append(None)
-    while len(scores) < n_questions:
-        scores.append(None)
-    while len(follow_ups) < n_questions:
-        follow_ups.append(None)
-    
-    # Update session state
-    st.session_state['answers'] = answers
-    st.session_state['feedbacks'] = feedbacks
-    st.session_state['scores'] = scores
-    st.session_state['follow_ups'] = follow_ups
+    interview.current_q = min(interview.current_q, n_questions - 1)
+    current_q = interview.current_q
     
     avatar = get_role_avatar(role)
-    current_question_data = questions[current_q]
+    current_question_data = load_question_bank().get(interview.question_ids[current_q])
+    interview.show(current_q)
 
     # Enhanced Progress Bar with Time Tracking
     progress = int((current_q + 1) / n_questions * 100)
     
-    # Add time tracking
-    if 'start_time' not in st.session_state:
-        st.session_state['start_time'] = datetime.now()
-    
-    elapsed_time = datetime.now() - st.session_state['start_time']
-    avg_time_per_question = elapsed_time / (current_q + 1) if current_q > 0 else elapsed_time
+    # Time per question so far
+    seconds = [s for s in interview.question_seconds() if s is not None]
+    avg_time_per_question = int(sum(seconds) / len(seconds))
     
-    col1, col2, col3 = st.columns([2, 1, 1])
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
     with col1:
         st.markdown(f'<div class="progress-bar"><div class="progress" style="width: {progress}%;"></div></div>', unsafe_allow_html=True)
         st.markdown(f"**Question {current_q + 1} of {n_questions}**")
     with col2:
         st.metric("Progress", f"{progress}%")
     with col3:
-        st.metric("Avg Time/Q", f"{avg_time_per_question.seconds//60}m {avg_time_per_question.seconds%60}s")
+        st.metric("Avg Time/Q", f"{avg_time_per_question//60}m {avg_time_per_question%60}s")
+    with col4:
+        if time_limit:
+            time_left = max(0, int(INTERVIEW_CONFIG['time_limit_per_question'] - (interview.question_seconds()[current_q] or 0)))
+            st.metric("Time Left", f"{time_left//60}m {time_left%60}s")
     
     # Enhanced Role and Difficulty Display
     difficulty_color = get_difficulty_color(current_question_data['difficulty'])
@@ -429,81 +324,185 @@ def interview_page():
     # Enhanced Chat-style Q&A with Confidence Tracking
     st.markdown(f'<div class="chat-bubble bot"><span class="avatar">{avatar}</span> <b>Interviewer:</b><br>{current_question_data["question"]}</div>', unsafe_allow_html=True)
     
-    # Real-time Answer Analysis
-    user_answer = st.text_area("Your Answer:", value=answers[current_q], key=f"answer_{current_q}", height=150)
+    # Answer box and evaluation panel rerun on their own, without rerunning the page
+    answer_panel(current_q, role)
+    evaluation_panel(current_q, role, avatar, show_hints)
+
+    # Enhanced Navigation
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        if st.button("⬅️ Previous", disabled=current_q==0):
+            interview.events.record(PREVIOUS, current_q)
+            interview.current_q -= 1
+            st.rerun()
+    
+    with col2:
+        if st.button("Next ➡️", disabled=current_q==n_questions-1):
+            interview.events.record(NEXT, current_q)
+            interview.current_q += 1
+            st.rerun()
+    
+    with col3:
+        if st.button("⏭️ Skip", disabled=not INTERVIEW_CONFIG["allow_skip"]):
+            interview.events.record(SKIPPED, current_q)
+            interview.current_q += 1
+            st.rerun()
+
+    # Enhanced End Session Button
+    if current_q == n_questions-1:
+        st.markdown("---")
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            if st.button("🎯 Finish Interview & See Summary", type="primary", use_container_width=True):
+                interview.events.record(FINISHED, current_q)
+                interview.leave()
+                st.session_state['page'] = 'summary'
+                st.rerun()
+
+@st.fragment
+def answer_panel(current_q, role):
+    """Answer box with live metrics; typing reruns only this fragment"""
+    started = time.thread_time()
+    interview = get_interview()
+    if interview is None:
+        st.rerun()
+    
+    # Real-time Answer Analysis; the answer is locked once the question's time limit runs out
+    if question_time_up(interview, current_q):
+        st.warning("⏰ Time's up for this question. You can still evaluate your answer.")
+        # A separate locked box shows the frozen answer; edits made after the deadline are never read
+        user_answer = st.text_area("Your Answer:", value=interview.answers[current_q], key=f"answer_locked_{current_q}", height=150, disabled=True)
+    else:
+        user_answer = st.text_area("Your Answer:", value=interview.answers[current_q], key=f"answer_{current_q}", height=150)
+    if user_answer.strip() and not interview.events.has(ANSWER_STARTED, current_q):
+        interview.events.record(ANSWER_STARTED, current_q)
     
     # Real-time feedback indicators
     if user_answer.strip():
-        word_count = len(user_answer.split())
-        char_count = len(user_answer)
+        signals = analyze_answer(user_answer, role)
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Words", word_count)
+            st.metric("Words", signals['word_count'])
         with col2:
-            st.metric("Characters", char_count)
+            st.metric("Characters", signals['char_count'])
         with col3:
-            # Confidence indicator based on answer length and content
-            confidence = min(10, max(1, word_count // 10 + (1 if any(word in user_answer.lower() for word in ['because', 'example', 'experience', 'implement', 'design', 'approach']) else 0)))
-            st.metric("Confidence", f"{confidence}/10")
+            # Confidence indicator from hedging, assertive phrasing and STAR structure
+            confidence = signals['confidence']
+            st.metric("Confidence", f"{confidence['level']}/10" if confidence else "Off")
         with col4:
             # Technical depth indicator
-            tech_words = sum(1 for word in ['algorithm', 'optimization', 'architecture', 'design', 'pattern', 'framework', 'api', 'database', 'testing', 'performance'] if word in user_answer.lower())
-            st.metric("Tech Depth", f"{tech_words} terms")
-    
-    st.session_state['answers'][current_q] = user_answer
+            st.metric("Tech Depth", f"{signals['tech_depth']} terms")
+        
+        if confidence and (confidence['hedges'] or confidence['star']):
+            notes = []
+            if confidence['hedges']:
+                hedges = ", ".join(f"'{phrase}' ×{count}" for phrase, count in confidence['hedges'].items())
+                notes.append(f"Hedging: {hedges} ({confidence['hedge_rate']:.1f} per 100 words)")
+            if confidence['star']:
+                notes.append("STAR: " + ", ".join(component.title() for component in confidence['star']))
+            st.caption(" · ".join(notes))
+    
+    interview.answers[current_q] = user_answer
+    if PERFORMANCE_CONFIG['show_cpu_metrics']:
+        record_cpu_time("answer fragment", started)
 
-    # Enhanced Navigation and Evaluation
-    col1, col2, col3, col4, col5 = st.columns([1, 1, 1, 1, 1])
+@st.fragment
+def evaluation_panel(current_q, role, avatar, show_hints):
+    """Evaluate/hint buttons, feedback and quick stats; evaluating reruns only this fragment"""
+    started = time.thread_time()
+    interview = get_interview()
+    if interview is None:
+        st.rerun()
+    current_question_data = load_question_bank().get(interview.question_ids[current_q])
     
+    col1, col2 = st.columns(2)
     with col1:
-        if st.button("⬅️ Previous", disabled=current_q==0):
-            st.session_state['current_q'] -= 1
-            st.rerun()
-    
-    with col2:
         if st.button("📊 Evaluate Answer"):
+            if question_time_up(interview, current_q):
+                # Past the deadline only the answer as it stood then is scored
+                user_answer = interview.answers[current_q]
+            else:
+                # Read the widget's value: the answer fragment may not have rerun since the last edit
+                user_answer = interview.answers[current_q] = st.session_state.get(f"answer_{current_q}", interview.answers[current_q])
             if user_answer.strip():
+                interview.events.record(EVALUATED, current_q)
                 with st.spinner("🤖 AI is analyzing your answer..."):
-                    feedback = evaluate_answer(current_question_data["question"], user_answer, current_question_data["difficulty"], role)
-                    st.session_state['feedbacks'][current_q] = feedback
-                    st.session_state['scores'][current_q] = extract_score_from_feedback(feedback)
-                    
-                    # Generate follow-up question
-                    follow_up = get_follow_up_question(current_question_data["question"], user_answer, current_question_data["difficulty"], role)
-                    st.session_state['follow_ups'][current_q] = follow_up
-                    st.rerun()
+                    # Only the structured evaluation is kept; feedback and follow-up are rendered from it
+                    evaluation = interview.evaluations[current_q] = score_answer(current_question_data["question"], user_answer, current_question_data["difficulty"], role, current_question_data["id"])
+                # A re-evaluation picks a new follow-up, unless the candidate already started answering the old one
+                thread = interview.threads[current_q]
+                if FEEDBACK_CONFIG['follow_up_questions'] and evaluation['follow_up'] is not None and not (thread and thread.answered()):
+                    interview.threads[current_q] = FollowUpThread(evaluation['follow_up'])
             else:
                 st.warning("Please provide an answer before evaluation.")
     
-    with col3:
-        if st.button("Next ➡️", disabled=current_q==n_questions-1):
-            st.session_state['current_q'] += 1
-            st.rerun()
-    
-    with col4:
-        if st.button("⏭️ Skip", disabled=not INTERVIEW_CONFIG["allow_skip"]):
-            st.session_state['current_q'] += 1
-            st.rerun()
-    
-    with col5:
+    with col2:
         if show_hints and st.button("💡 Hint"):
             # Show hint based on question type
-            hint = get_question_hint(current_question_data["question"], role)
+            hint = get_question_hint(current_question_data["id"])
             st.markdown(f'<div class="hint-box">💡 <strong>Hint:</strong> {hint}</div>', unsafe_allow_html=True)
 
     # Enhanced Feedback Display with Animations
-    if feedbacks[current_q]:
+    evaluation = interview.evaluations[current_q]
+    if evaluation:
+        feedback = render_feedback(evaluation)
+        follow_up = get_evaluation_follow_up(evaluation)
+        if evaluation.get('duplicate'):
+            st.warning(f"⚠️ This answer is {evaluation['duplicate']['similarity']:.0%} similar to a previously submitted answer. Try answering in your own words.")
         st.markdown(f'<div class="chat-bubble bot"><span class="avatar">{avatar}</span> <b>Interviewer Feedback:</b></div>', unsafe_allow_html=True)
         
         # Animated feedback box
-        st.markdown(f'<div class="feedback-box animated">{feedbacks[current_q]}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="feedback-box animated">{feedback}</div>', unsafe_allow_html=True)
         
-        # Show follow-up question with enhanced styling
-        if follow_ups[current_q]:
-            st.markdown(f'<div class="chat-bubble bot follow-up"><span class="avatar">{avatar}</span> <b>Follow-up Question:</b><br>{follow_ups[current_q]}</div>', unsafe_allow_html=True)
+        # Follow-ups are answered and scored in a thread; without one the follow-up is only shown
+        if interview.threads[current_q]:
+            follow_up_panel(interview, current_q, role, avatar, current_question_data["difficulty"])
+        elif follow_up:
+            st.markdown(f'<div class="chat-bubble bot follow-up"><span class="avatar">{avatar}</span> <b>Follow-up Question:</b><br>{follow_up}</div>', unsafe_allow_html=True)
+    
+    # Scores only change on evaluation, so the stats panel lives in this fragment
+    quick_stats_panel(interview)
+    if PERFORMANCE_CONFIG['show_cpu_metrics']:
+        record_cpu_time("evaluation fragment", started)
+
+def follow_up_panel(interview, current_q, role, avatar, difficulty):
+    """Follow-up turns under the current question, each with its own answer and score"""
+    thread = interview.threads[current_q]
+    for t, prompt in enumerate(thread.prompts):
+        st.markdown(f'<div class="chat-bubble bot follow-up"><span class="avatar">{avatar}</span> <b>Follow-up Question:</b><br>{get_follow_up_text(role, prompt)}</div>', unsafe_allow_html=True)
+        thread.answers[t] = st.text_area("Your Follow-up Answer:", value=thread.answers[t], key=f"follow_up_{current_q}_{t}", height=100)
+        turn_evaluation = thread.evaluations[t]
+        if turn_evaluation:
+            with st.expander(f"Follow-up Score: {turn_evaluation['score']}/10"):
+                st.markdown(render_feedback(turn_evaluation))
+    
+    # Scored in the click callback, before the turns above are drawn again
+    st.button("📊 Evaluate Follow-ups", on_click=evaluate_follow_ups, args=(current_q, role, difficulty))
+
+def evaluate_follow_ups(current_q, role, difficulty):
+    """Score the follow-up answers edited since their last evaluation and open the next turn"""
+    interview = get_interview()
+    if interview is None or not interview.threads[current_q]:
+        return
+    thread = interview.threads[current_q]
+    for t in range(len(thread)):
+        thread.answers[t] = st.session_state.get(f"follow_up_{current_q}_{t}", thread.answers[t])
+    
+    # Unchanged turns keep their cached evaluation
+    rescored = thread.evaluate(lambda prompt, answer: score_follow_up(role, prompt, answer, difficulty))
+    st.toast(f"Scored {len(rescored)} of {len(thread)} follow-up answers; the rest were unchanged")
+    last = thread.evaluations[-1]
+    if last and last['follow_up'] is not None and last['follow_up'] not in thread.prompts and len(thread) < INTERVIEW_CONFIG['max_follow_ups']:
+        thread.open(last['follow_up'])
+
+def quick_stats_panel(interview):
+    """Quick Stats for the session so far"""
+    answers = interview.answers
+    scores = interview.scores
+    n_questions = len(interview.question_ids)
     
-    # Quick Stats Panel
     if any(s for s in scores if s is not None):
         st.markdown("---")
         st.markdown("### 📈 Quick Stats")
@@ -523,68 +522,62 @@ def interview_page():
             best_score = max(s for s in scores if s is not None) if any(s for s in scores if s is not None) else 0
             st.metric("Best Score", f"{best_score}/10")
 
-    # Enhanced End Session Button
-    if current_q == n_questions-1 and any(a.strip() for a in answers):
-        st.markdown("---")
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            if st.button("🎯 Finish Interview & See Summary", type="primary", use_container_width=True):
-                st.session_state['page'] = 'summary'
-                st.rerun()
-
-# Helper function for question hints
-def get_question_hint(question, role):
-    """Generate helpful hints based on question content and role"""
-    question_lower = question.lower()
-    
-    if 'algorithm' in question_lower or 'complexity' in question_lower:
-        return "Think about time and space complexity, and consider different approaches."
-    elif 'design' in question_lower or 'architecture' in question_lower:
-        return "Consider scalability, maintainability, and trade-offs between different approaches."
-    elif 'experience' in question_lower or 'project' in question_lower:
-        return "Use the STAR method: Situation, Task, Action, Result."
-    elif 'problem' in question_lower or 'challenge' in question_lower:
-        return "Break down the problem, explain your approach, and discuss potential solutions."
-    elif 'team' in question_lower or 'collaboration' in question_lower:
-        return "Focus on communication, conflict resolution, and achieving common goals."
-    else:
-        return "Provide specific examples and explain your reasoning clearly."
-
 # --- Summary Page ---
 def summary_page():
-    role = st.session_state['role']
+    interview = get_interview()
+    if interview is None:
+        interview_expired()
+        return
+    
+    role = interview.role
     avatar = get_role_avatar(role)
-    questions = st.session_state['questions']
-    answers = st.session_state['answers']
-    feedbacks = st.session_state['feedbacks']
-    scores = st.session_state['scores']
+    bank = load_question_bank()
+    questions = [bank.get(question_id) for question_id in interview.question_ids]
+    answers = interview.answers
+    evaluations = interview.evaluations
+    follow_ups = [thread.to_list(role) if thread else [] for thread in interview.threads]
+    feedbacks = [render_feedback(e) if e else None for e in evaluations]
+    scores = interview.scores
     n_questions = len(questions)
 
     st.markdown(f'<h1 class="main-header">📊 Interview Summary</h1>', unsafe_allow_html=True)
     
-    # Prepare session data for analytics
+    # Prepare session data for analytics; timing events are saved with it
+    events = interview.events.to_list()
     session_data = {
+        'user_id': interview.user_id,
         'role': role,
-        'difficulty': st.session_state['difficulty'],
-        'questions': []
+        'difficulty': interview.difficulty,
+        'questions': [],
+        'events': events
     }
     
-    for i, (q_data, a, f, s) in enumerate(zip(questions, answers, feedbacks, scores)):
+    seconds = interview.question_seconds()
+    for i, (q_data, a, f, e, s, t, u) in enumerate(zip(questions, answers, feedbacks, evaluations, scores, seconds, follow_ups)):
         session_data['questions'].append({
+            'id': q_data.get('id'),
             'question': q_data['question'],
             'difficulty': q_data['difficulty'],
             'answer': a,
             'feedback': f,
-            'score': s
+            'evaluation': e,
+            'score': s,
+            'seconds': t,
+            'follow_ups': u
         })
     
     # Generate analytics
     metrics = analytics.generate_performance_metrics(session_data)
     
     if metrics:
-        # Save session to analytics
-        if ANALYTICS_CONFIG['save_sessions']:
-            analytics.save_session(session_data)
+        # Save session to analytics (once, not on every rerun of this page)
+        if not interview.saved:
+            if ANALYTICS_CONFIG['save_sessions']:
+                # The save writer also folds the session into the adaptive question statistics
+                analytics.save_session(session_data, interview.user_id)
+            else:
+                record_session_results(interview.user_id, session_data)
+            interview.saved = True
         
         # Display metrics
         col1, col2, col3, col4 = st.columns(4)
@@ -597,6 +590,14 @@ def summary_page():
         with col4:
             st.metric("Highest Score", f"{metrics['highest_score']}/10")
         
+        # Ranking against everyone who interviewed for this role
+        rankings = analytics.session_percentiles(session_data)
+        if rankings:
+            st.markdown("### 🏆 How You Compare")
+            for rank in rankings:
+                scope = "overall" if rank['difficulty'] == 'All' else f"on {rank['difficulty']} questions"
+                st.markdown(f"You scored better than **{rank['percentile']:.0f}%** of {role} candidates {scope} ({rank['cohort_size']} sessions)")
+        
         # Performance charts
         col1, col2 = st.columns(2)
         with col1:
@@ -625,7 +626,7 @@ def summary_page():
     st.markdown("---")
     st.markdown("### 📋 Detailed Review")
     
-    for i, (q_data, a, f, s) in enumerate(zip(questions, answers, feedbacks, scores)):
+    for i, (q_data, a, f, s, u) in enumerate(zip(questions, answers, feedbacks, scores, follow_ups)):
         with st.expander(f"Question {i+1}: {q_data['question'][:50]}..."):
             difficulty_color = get_difficulty_color(q_data['difficulty'])
             text_color = get_difficulty_text_color(q_data['difficulty'])
@@ -635,14 +636,17 @@ def summary_page():
                 st.markdown(f"**Score:** {s}/10")
             if f:
                 st.markdown(f"**Feedback:** {f}")
+            for turn in u:
+                st.markdown(f"**Follow-up:** {turn['question']}")
+                st.markdown(f"**Your Answer:** {turn['answer']}")
+                if turn['score']:
+                    st.markdown(f"**Score:** {turn['score']}/10")
     
     # Action buttons
     col1, col2, col3 = st.columns(3)
     with col1:
         if st.button("🔄 Restart Interview"):
-            for key in ['page','role','difficulty','questions','answers','feedbacks','scores','current_q','follow_ups']:
-                if key in st.session_state:
-                    del st.session_state[key]
+            end_interview()
             st.rerun()
     
     with col2:
@@ -660,23 +664,126 @@ def summary_page():
 
 # --- Analytics Page ---
 def analytics_page():
+    # Charting libraries are only needed here, so the other pages never pay for importing them
+    import pandas as pd
+    import plotly.express as px
+    
     st.markdown(f'<h1 class="main-header">📈 Performance Analytics</h1>', unsafe_allow_html=True)
     
     # Session history
-    history = analytics.get_session_history()
+    history = analytics.get_session_history(st.session_state['user_id'])
     if history:
         st.markdown("### 📊 Recent Sessions")
         df = pd.DataFrame(history)
         st.dataframe(df, use_container_width=True)
         
-        # Performance trends
-        if len(history) > 1:
-            fig = px.line(df, x='date', y=['avg_score', 'weighted_score'], 
-                         title="Performance Trends Over Time")
+        # Performance trends, read from pre-aggregated time buckets
+        st.markdown("### 📈 Performance Trends")
+        col1, col2 = st.columns(2)
+        with col1:
+            granularity = st.selectbox("Group By:", ["weekly", "daily", "monthly"], format_func=str.title)
+        with col2:
+            today = datetime.now().date()
+            date_range = st.date_input("Date Range:", (today - timedelta(days=365), today))
+        start, end = (date_range[0], date_range[-1]) if date_range else (None, None)
+        
+        trend = analytics.get_trend(st.session_state['user_id'], granularity, start, end)
+        if len(trend) > 1:
+            fig = px.line(pd.DataFrame(trend), x='period', y=['avg_score', 'weighted_score'], 
+                         title="Performance Trends Over Time", markers=True)
             st.plotly_chart(fig, use_container_width=True)
+        elif trend:
+            st.info("Only one period in this range so far. Widen the range or pick a finer grouping to see a trend.")
+        
+        # Full-text search over this candidate's past answers
+        st.markdown("### 🔍 Search Past Answers")
+        def reset_search_page():
+            st.session_state.pop('search_page', None)
+        
+        query = st.text_input("Search:", placeholder='e.g. "garbage collection" NOT jvm', key='search_query', on_change=reset_search_page)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            search_role = st.selectbox("Role:", ["All"] + load_question_bank().roles, key='search_role', on_change=reset_search_page)
+        with col2:
+            search_difficulty = st.selectbox("Question Difficulty:", ["All", "Easy", "Medium", "Hard"], key='search_difficulty', on_change=reset_search_page)
+        with col3:
+            min_score, max_score = st.slider("Score Range:", 1, 10, (1, 10), key='search_scores', on_change=reset_search_page)
+        
+        if query.strip():
+            page = st.session_state.get('search_page', 0)
+            try:
+                found = analytics.search_answers(
+                    query, st.session_state['user_id'],
+                    role=None if search_role == "All" else search_role,
+                    difficulty=None if search_difficulty == "All" else search_difficulty,
+                    min_score=min_score, max_score=max_score, page=page
+                )
+            except ValueError as e:
+                st.error(str(e))
+                found = None
+            
+            if found:
+                n_pages = max(1, -(-found['total'] // found['page_size']))
+                st.caption(f"{found['total']} matching answers · page {page + 1} of {n_pages}")
+                for result in found['results']:
+                    score = f"{result['score']}/10" if result['score'] else "not scored"
+                    st.markdown(f"**{result['question']}**  \n"
+                                f"{result['role']} · {result['difficulty']} · {score} · {(result['timestamp'] or '')[:10]}  \n"
+                                f"> {result['snippet']}")
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("⬅️ Previous Results", disabled=page == 0):
+                        st.session_state['search_page'] = page - 1
+                        st.rerun()
+                with col2:
+                    if st.button("More Results ➡️", disabled=page + 1 >= n_pages):
+                        st.session_state['search_page'] = page + 1
+                        st.rerun()
     else:
         st.info("No previous sessions found. Complete an interview to see analytics!")
     
+    # Cross-candidate score scans over the columnar score store
+    if analytics.score_store.rows:
+        st.markdown("### 🔎 Score Explorer (All Candidates)")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            explore_role = st.selectbox("Role:", ["All"] + load_question_bank().roles)
+        with col2:
+            explore_difficulty = st.selectbox("Question Difficulty:", ["All", "Easy", "Medium", "Hard"])
+        with col3:
+            explore_days = st.selectbox("Period:", [30, 90, 365, None], index=1, format_func=lambda d: f"Last {d} days" if d else "All time")
+        
+        summary = analytics.query_scores(
+            role=None if explore_role == "All" else explore_role,
+            difficulty=None if explore_difficulty == "All" else explore_difficulty,
+            days=explore_days
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Scored Answers", summary['count'])
+        with col2:
+            st.metric("Average Score", f"{summary['mean']:.1f}/10")
+        if summary['count']:
+            fig = px.bar(x=list(range(1, 11)), y=summary['histogram'][1:], 
+                         labels={'x': 'Score', 'y': 'Answers'}, title="Score Distribution")
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # Time per question, from the interviews' timing events
+        timing = analytics.time_per_question(role=None if explore_role == "All" else explore_role, days=explore_days)
+        if timing['overall']['count']:
+            st.markdown("#### ⏱️ Time per Question")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Timed Answers", timing['overall']['count'])
+            with col2:
+                st.metric("Median Time", f"{timing['overall']['median']:.0f}s")
+            with col3:
+                st.metric("90th Percentile", f"{timing['overall']['p90']:.0f}s")
+            if timing['by_difficulty']:
+                fig = px.bar(x=list(timing['by_difficulty']), y=list(timing['by_difficulty'].values()),
+                             labels={'x': 'Difficulty', 'y': 'Seconds'}, title="Average Time by Difficulty")
+                st.plotly_chart(fig, use_container_width=True)
+    
     if st.button("🏠 Back to Home"):
         st.session_state['page'] = 'landing'
         st.rerun()
@@ -689,4 +796,11 @@ elif st.session_state['page'] == 'interview':
 elif st.session_state['page'] == 'summary':
     summary_page()
 elif st.session_state['page'] == 'analytics':
-    analytics_page() 
\ No newline at end of file
+    analytics_page()
+
+if PERFORMANCE_CONFIG['show_cpu_metrics']:
+    record_cpu_time(f"{st.session_state['page']} page (full run)", run_cpu_start)
+    show_cpu_metrics() 
+
+if PERFORMANCE_CONFIG['show_memory_metrics']:
+    show_memory_metrics() 
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""Import-time profile of the app's startup imports
+
+Usage (from the repository root):
+    python benchmarks/import_time.py            # print the profile
+    python benchmarks/import_time.py --save     # record it as the tracked baseline
+    python benchmarks/import_time.py --check    # fail if startup imports regressed against the baseline
+
+Each run starts a fresh interpreter with `-X importtime`, imports streamlit first (the
+server has it loaded already) and then the modules app.py imports at the top. Times are
+the median over several runs, in milliseconds.
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "import_time_baseline.json")
+APP_MODULES = ['config', 'storage', 'question_bank', 'interview_bot', 'analytics', 'session_store', 'theme']
+HEAVY_PACKAGES = ['pandas', 'plotly', 'numpy', 'dotenv']
+RUNS = 7
+ALLOWED_REGRESSION = 1.25  # --check fails when the startup total grows by more than 25%
+
+def profile_once():
+    """Cumulative import time (us) of every top-level import after streamlit, in one fresh process"""
+    code = "import streamlit; " + "; ".join(f"import {module}" for module in APP_MODULES)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    streamlit_done = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        # Nested imports are indented and reported before their parent
+        top_level = not name.startswith("  ")
+        name = name.strip()
+        if top_level and name == "streamlit":
+            streamlit_done = True
+        elif streamlit_done and (top_level or name in HEAVY_PACKAGES):
+            times[name] = int(cumulative)
+    return times
+
+def profile(runs=RUNS):
+    """Median import time (ms) per app module and heavy package, plus the startup total"""
+    samples = [profile_once() for _ in range(runs)]
+    report = {'modules': {}, 'heavy_packages': {}}
+    for module in APP_MODULES:
+        report['modules'][module] = statistics.median(s.get(module, 0) for s in samples) / 1000
+    for package in HEAVY_PACKAGES:
+        # Heavy packages only count when something imported them during startup
+        report['heavy_packages'][package] = statistics.median(s.get(package, 0) for s in samples) / 1000
+    report['total'] = statistics.median(sum(s.get(module, 0) for module in APP_MODULES) for s in samples) / 1000
+    return report
+
+def print_report(report):
+    print("Startup imports after streamlit (median ms)")
+    for module, ms in report['modules'].items():
+        print(f"  {module:<16} {ms:8.1f}")
+    print(f"  {'total':<16} {report['total']:8.1f}")
+    loaded = {package: ms for package, ms in report['heavy_packages'].items() if ms}
+    print("Heavy packages loaded at startup:", ", ".join(f"{p} ({ms:.1f} ms)" for p, ms in loaded.items()) or "none")
+
+if __name__ == "__main__":
+    report = profile()
+    print_report(report)
+    if "--save" in sys.argv:
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {BASELINE_FILE}")
+    if "--check" in sys.argv:
+        with open(BASELINE_FILE, 'r') as f:
+            baseline = json.load(f)
+        limit = baseline['total'] * ALLOWED_REGRESSION
+        print(f"Baseline total {baseline['total']:.1f} ms, limit {limit:.1f} ms")
+        if report['total'] > limit:
+            print("Startup import time regressed")
+            sys.exit(1)
@@ -0,0 +1,193 @@
+import os
+import json
+import math
+import threading
+from functools import lru_cache
+from config import ANALYTICS_CONFIG, STORAGE_CONFIG
+
+CALIBRATION_FILE = "calibration.json"
+MIN_RESPONSES = 20  # Below this many scores a question keeps its hand-assigned difficulty
+LEVEL_THRESHOLD = 0.5  # Standard deviations from the overall mean score that make a question Easy or Hard
+
+class RunningStats:
+    """Online count, mean and variance (Welford)"""
+    __slots__ = ('n', 'mean', 'm2')
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+class QuestionStats:
+    """Empirical difficulty and discrimination of one question, updated one score at a time
+
+    Discrimination is the correlation between the question's score and the mean score of
+    the other questions in the same session, kept as an online co-moment.
+    """
+    __slots__ = ('scores', 'pairs', 'pair_mean', 'rest', 'co_moment')
+
+    def __init__(self, values=None):
+        values = values or [0, 0.0, 0.0, 0, 0.0, 0.0, 0.0, 0.0, 0.0]
+        self.scores = RunningStats(*values[0:3])
+        self.pairs = RunningStats(*values[3:6])  # Question scores from sessions with other scored questions
+        self.rest = RunningStats(values[3], *values[6:8])  # Matching rest-of-session means
+        self.co_moment = values[8]
+
+    def add(self, score, rest_mean=None):
+        self.scores.add(score)
+        if rest_mean is None:
+            return
+        # Co-moment update uses the score delta before and the rest delta after updating the means
+        delta = score - self.pairs.mean
+        self.pairs.add(score)
+        self.rest.add(rest_mean)
+        self.co_moment += delta * (rest_mean - self.rest.mean)
+
+    @property
+    def discrimination(self):
+        """Item-rest correlation in [-1, 1], or None without enough varied data"""
+        if self.pairs.n < 2 or not self.pairs.m2 or not self.rest.m2:
+            return None
+        return self.co_moment / math.sqrt(self.pairs.m2 * self.rest.m2)
+
+    def to_list(self):
+        return [self.scores.n, self.scores.mean, self.scores.m2,
+                self.pairs.n, self.pairs.mean, self.pairs.m2,
+                self.rest.mean, self.rest.m2, self.co_moment]
+
+class CalibrationIndex:
+    """Per-question empirical difficulty, looked up in O(1) and updated incrementally per session"""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.overall = RunningStats()
+        self.questions = {}
+        self.applied_seq = 0  # Save spool seq of the last session added
+        self._mtime = None  # Modification time of the file as last loaded or saved
+        self.on_disk = os.path.exists(path)
+        if self.on_disk:
+            self._load()
+
+    def _load(self):
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        self.overall = RunningStats(*data['overall'])
+        self.questions = {qid: QuestionStats(values) for qid, values in data['questions'].items()}
+        self.applied_seq = data.get('applied_seq', 0)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def reload_if_changed(self):
+        """Reload the file if another process (python calibration.py) replaced it since it was loaded or saved"""
+        if self.on_disk and os.path.exists(self.path) and os.stat(self.path).st_mtime_ns != self._mtime:
+            with self._lock:
+                self._load()
+
+    def _add_session(self, session_data):
+        self.applied_seq = max(self.applied_seq, session_data.get('seq', 0))
+        # Scores already carry the multiplier of the level being measured, so the raw score is used where
+        # it was recorded; otherwise calibrated levels would feed back into their own measurements
+        scored = [(q.get('id'), (q.get('evaluation') or {}).get('raw_score') or q['score'])
+                  for q in session_data['questions'] if q.get('score') and q.get('id')]
+        total = sum(score for _, score in scored)
+        for question_id, score in scored:
+            stats = self.questions.get(question_id)
+            if stats is None:
+                stats = self.questions[question_id] = QuestionStats()
+            rest_mean = (total - score) / (len(scored) - 1) if len(scored) > 1 else None
+            stats.add(score, rest_mean)
+            self.overall.add(score)
+
+    def add_sessions(self, sessions):
+        """Fold newly stored sessions into the statistics"""
+        with self._lock:
+            for session_data in sessions:
+                self._add_session(session_data)
+
+    def rebuild(self, sessions):
+        """Recompute everything from a stream of sessions (an iterator; history is never held in memory)"""
+        with self._lock:
+            self.overall = RunningStats()
+            self.questions = {}
+            self.applied_seq = 0
+            for session_data in sessions:
+                self._add_session(session_data)
+
+    def save(self):
+        with self._lock:
+            data = {
+                'overall': [self.overall.n, self.overall.mean, self.overall.m2],
+                'questions': {qid: stats.to_list() for qid, stats in self.questions.items()},
+                'applied_seq': self.applied_seq
+            }
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self.on_disk = True
+
+    def difficulty_level(self, question_id, default="Medium"):
+        """Empirical difficulty level of a question; the hand-assigned one until it has enough scores"""
+        stats = self.questions.get(question_id)
+        if stats is None or stats.scores.n < MIN_RESPONSES or self.overall.n < 2:
+            return default
+        spread = math.sqrt(self.overall.variance) or 1.0
+        z = (self.overall.mean - stats.scores.mean) / spread
+        if z > LEVEL_THRESHOLD:
+            return "Hard"
+        if z < -LEVEL_THRESHOLD:
+            return "Easy"
+        return "Medium"
+
+    def difficulty_weight(self, question_id, default="Medium"):
+        """Scoring weight for a question from its empirical difficulty level"""
+        return ANALYTICS_CONFIG['difficulty_weighting'].get(self.difficulty_level(question_id, default), 1.0)
+
+    def question_report(self, question_id):
+        """Responses, mean, standard deviation, discrimination and level of a question"""
+        stats = self.questions.get(question_id)
+        if stats is None:
+            return None
+        return {
+            'responses': stats.scores.n,
+            'mean': stats.scores.mean,
+            'std': math.sqrt(stats.scores.variance),
+            'discrimination': stats.discrimination,
+            'level': self.difficulty_level(question_id, None)
+        }
+
+@lru_cache(maxsize=None)
+def get_calibration_index(path=None):
+    """Shared calibration index (once per process)"""
+    return CalibrationIndex(path or os.path.join(STORAGE_CONFIG['data_dir'], CALIBRATION_FILE))
+
+if __name__ == "__main__":
+    # Usage: python calibration.py
+    # Recalibrates every question from all stored sessions, streaming one partition at a time.
+    # Safe while the app runs: it only reads stored sessions (saves still queued in the app are added
+    # by the app afterwards), and the app reloads the file before its next save.
+    from analytics import InterviewAnalytics
+    from question_bank import load_question_bank
+    analytics = InterviewAnalytics(read_only=True)
+    index = get_calibration_index()
+    index.rebuild(analytics.iter_all_sessions())
+    index.save()
+    bank = load_question_bank()
+    changed = 0
+    for question_id, record in bank.by_id.items():
+        level = index.difficulty_level(question_id, record["difficulty"])
+        if level != record["difficulty"]:
+            changed += 1
+            report = index.question_report(question_id)
+            print(f"{record['difficulty']:>6} -> {level:<6} mean {report['mean']:.1f} over {report['responses']} | {record['question'][:60]}")
+    print(f"Calibrated {len(index.questions)} questions from {index.overall.n} scores; {changed} differ from their label")
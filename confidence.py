@@ -0,0 +1,88 @@
+from collections import Counter
+from answer_pipeline import TOKEN_PATTERN
+
+STAR_COMPONENTS = ('situation', 'task', 'action', 'result')
+NEUTRAL_LEVEL = 5  # Confidence of an answer with no hedging, assertive or structure signals
+MAX_HEDGE_PENALTY = 4  # Levels lost at 8+ weighted hedges per 100 words
+MAX_ASSERTIVE_BONUS = 2  # Levels gained at 4+ assertive phrases per 100 words
+STAR_BONUS = 0.5  # Levels gained per STAR component the answer touches
+SCORE_WEIGHT = 0.5  # Answer score points per confidence level away from neutral
+
+_END = object()
+
+def _words(text):
+    # Apostrophes are dropped so "don't" and "dont" are the same word
+    return [token.replace("'", "") for token in TOKEN_PATTERN.findall(text.lower())]
+
+class PhraseScanner:
+    """Counts every occurrence of a set of 1-n word phrases in one left-to-right pass over the tokens
+
+    Phrases only match whole tokens ("maybe" never matches inside another word), and the longest
+    phrase starting at a position wins, so each word is counted at most once.
+    """
+    def __init__(self, phrases):
+        self.trie = {}
+        for phrase in phrases:
+            node = self.trie
+            for word in _words(phrase):
+                node = node.setdefault(word, {})
+            node[_END] = phrase
+
+    def scan(self, tokens):
+        """Map each phrase found in a token sequence to its number of occurrences"""
+        counts = Counter()
+        words = [token.replace("'", "") for token in tokens]
+        i = 0
+        while i < len(words):
+            node = self.trie
+            match = None
+            j = i
+            # Walks at most the longest phrase's length, so the scan is linear in the answer length
+            while j < len(words) and words[j] in node:
+                node = node[words[j]]
+                j += 1
+                if _END in node:
+                    match = (node[_END], j)
+            if match:
+                counts[match[0]] += 1
+                i = match[1]
+            else:
+                i += 1
+        return counts
+
+class ConfidenceAnalyzer:
+    """Hedging, assertive phrasing and STAR structure of an answer, as rates per 100 words and a 1-10 level"""
+    def __init__(self, vocabularies):
+        self.hedges = vocabularies['hedges']  # phrase -> (negative) weight per occurrence
+        self.assertive = vocabularies['assertive']  # phrase -> weight per occurrence
+        self.structure = {}  # phrase -> STAR components it marks
+        for component, phrases in vocabularies['structure'].items():
+            for phrase in phrases:
+                self.structure.setdefault(phrase, []).append(component)
+        self.scanner = PhraseScanner(set(self.hedges) | set(self.assertive) | set(self.structure))
+
+    def analyze(self, features):
+        """Confidence signals of a preprocessed answer"""
+        counts = self.scanner.scan(features.tokens)
+        per_100_words = 100 / max(1, len(features.tokens))
+        hedges = {phrase: n for phrase, n in counts.items() if phrase in self.hedges}
+        assertive = {phrase: n for phrase, n in counts.items() if phrase in self.assertive}
+        star = set()
+        for phrase in counts:
+            star.update(self.structure.get(phrase, ()))
+
+        hedge_rate = -sum(self.hedges[p] * n for p, n in hedges.items()) * per_100_words
+        assertive_rate = sum(self.assertive[p] * n for p, n in assertive.items()) * per_100_words
+        level = (NEUTRAL_LEVEL
+                 - min(MAX_HEDGE_PENALTY, hedge_rate / 2)
+                 + min(MAX_ASSERTIVE_BONUS, assertive_rate / 2)
+                 + STAR_BONUS * len(star))
+        return {
+            'level': max(1, min(10, round(level))),
+            'hedges': hedges,
+            'assertive': assertive,
+            'star': [component for component in STAR_COMPONENTS if component in star],
+            'hedge_rate': hedge_rate,
+            'assertive_rate': assertive_rate,
+            'score_adjustment': (level - NEUTRAL_LEVEL) * SCORE_WEIGHT
+        }
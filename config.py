@@ -15,6 +15,7 @@ ANALYTICS_CONFIG = {
     "track_performance": True,
     "save_sessions": True,
     "generate_reports": True,
+    "report_dir": "reports",  # Output of the batch report generator (python reports.py)
     "difficulty_weighting": {
         "Easy": 1.0,
         "Medium": 1.5,
@@ -36,7 +37,9 @@ INTERVIEW_CONFIG = {
     "max_questions": 15,
     "time_limit_per_question": 300,  # seconds
     "allow_skip": True,
-    "show_hints": False
+    "max_follow_ups": 2,  # Follow-up turns a candidate can answer under each question
+    "show_hints": False,
+    "session_idle_timeout": 1800  # seconds before an abandoned interview is evicted
 }
 
 # Feedback Configuration
@@ -44,5 +47,23 @@ FEEDBACK_CONFIG = {
     "detailed_scoring": True,
     "improvement_suggestions": True,
     "follow_up_questions": True,
-    "confidence_analysis": True
-} 
\ No newline at end of file
+    "confidence_analysis": True,
+    "duplicate_detection": True,  # Flag answers that closely match stored ones and reuse their scores
+    "rubric": 1,  # Scoring rubric version (rubrics.json) behind every live score
+    "shadow_rubric": None  # Candidate rubric also scoring live answers in the background, or None
+} 
+# Storage Configuration
+STORAGE_CONFIG = {
+    "data_dir": "data",
+    "default_user": "local",
+    "write_batch_size": 50,  # Sessions applied per group commit by the background writer
+    "write_batch_window": 0.05,  # seconds the writer waits for more sessions to join a batch
+    "write_flush_timeout": 5,  # seconds a read waits for queued saves before using what is stored
+    "write_max_attempts": 3  # attempts at a failing save before it is moved to the spool's dead-letter file
+}
+
+# Performance Configuration
+PERFORMANCE_CONFIG = {
+    "show_cpu_metrics": False,  # Sidebar readout of server CPU time per page/fragment run
+    "show_memory_metrics": False  # Sidebar readout of interview state memory per session
+}
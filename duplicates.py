@@ -0,0 +1,164 @@
+import os
+import json
+import zlib
+import sqlite3
+import threading
+from functools import lru_cache
+from config import STORAGE_CONFIG
+from answer_pipeline import preprocess_answer
+
+ANSWER_INDEX_FILE = "answer_index.sqlite"
+NUM_PERM = 64
+BANDS = 16  # 16 bands of 4 rows: pairs above ~0.5 Jaccard similarity usually share a bucket
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3  # Word n-grams
+MIN_SHINGLES = 5  # Shorter answers are too generic to call duplicates
+DUPLICATE_THRESHOLD = 0.8  # Estimated Jaccard similarity that flags a near-duplicate
+MAX_CANDIDATES = 200  # Bucket entries read per lookup, so very common canned answers stay cheap
+
+MERSENNE_PRIME = (1 << 31) - 1
+
+@lru_cache(maxsize=1)
+def _permutations():
+    import numpy as np
+    rng = np.random.RandomState(1)  # Fixed seed: signatures are stored, so permutations never change
+    return (rng.randint(1, MERSENNE_PRIME, NUM_PERM).astype(np.uint64),
+            rng.randint(0, MERSENNE_PRIME, NUM_PERM).astype(np.uint64))
+
+def minhash_signature(answer):
+    """MinHash signature of an answer's word shingles, or None if it is too short to compare"""
+    import numpy as np
+    tokens = preprocess_answer(answer).tokens
+    shingles = {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) & MERSENNE_PRIME for s in shingles), dtype=np.uint64)
+    a, b = _permutations()
+    return ((np.outer(hashes, a) + b) % MERSENNE_PRIME).min(axis=0).astype(np.uint32)
+
+def _band_buckets(signature):
+    return [(band, zlib.crc32(signature[band * ROWS:(band + 1) * ROWS].tobytes())) for band in range(BANDS)]
+
+class AnswerIndex:
+    """On-disk MinHash LSH index of stored answers, with the evaluation each one received"""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                user_id TEXT,
+                role TEXT,
+                question_id TEXT,
+                signature BLOB NOT NULL,
+                score INTEGER,
+                evaluation TEXT
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                answer_id INTEGER NOT NULL,
+                PRIMARY KEY (band, bucket, answer_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        # Connecting creates the file, so only the marker written by a finished rebuild() proves it was backfilled
+        self.is_new = self._db.execute("SELECT 1 FROM meta WHERE key = 'built'").fetchone() is None
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'applied_seq'").fetchone()
+        self.applied_seq = int(row[0]) if row else 0  # Save spool seq of the last session added
+
+    def add_sessions(self, sessions):
+        """Index every answered question of newly stored sessions, in one transaction"""
+        rows = []
+        for session_data in sessions:
+            for q_data in session_data['questions']:
+                signature = minhash_signature(q_data.get('answer') or '')
+                if signature is not None:
+                    evaluation = q_data.get('evaluation')
+                    rows.append((session_data.get('user_id'), session_data.get('role'), q_data.get('id'),
+                                 signature, q_data.get('score'), json.dumps(evaluation) if evaluation else None))
+        seq = max((session_data.get('seq', 0) for session_data in sessions), default=0)
+        if not rows and seq <= self.applied_seq:
+            return
+        with self._lock, self._db:
+            for user_id, role, question_id, signature, score, evaluation in rows:
+                cursor = self._db.execute(
+                    "INSERT INTO answers (user_id, role, question_id, signature, score, evaluation) VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, role, question_id, signature.tobytes(), score, evaluation)
+                )
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO buckets (band, bucket, answer_id) VALUES (?, ?, ?)",
+                    [(band, bucket, cursor.lastrowid) for band, bucket in _band_buckets(signature)]
+                )
+            if seq > self.applied_seq:
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('applied_seq', ?)", (seq,))
+        self.applied_seq = max(self.applied_seq, seq)
+
+    def rebuild(self, sessions):
+        """Re-index every answer from a stream of sessions (with answer text)"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM meta")
+            self._db.execute("DELETE FROM buckets")
+            self._db.execute("DELETE FROM answers")
+        self.applied_seq = 0
+        batch = []
+        for session_data in sessions:
+            batch.append(session_data)
+            if len(batch) >= 500:
+                self.add_sessions(batch)
+                batch = []
+        self.add_sessions(batch)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', datetime('now'))")
+        self.is_new = False
+
+    def find_duplicate(self, answer, question_id=None):
+        """Most similar stored answer at or above DUPLICATE_THRESHOLD, or None
+
+        Answers to the same question are preferred when equally similar.
+        """
+        import numpy as np
+        signature = minhash_signature(answer)
+        if signature is None:
+            return None
+
+        with self._lock:
+            candidates = set()
+            for band, bucket in _band_buckets(signature):
+                rows = self._db.execute(
+                    "SELECT answer_id FROM buckets WHERE band = ? AND bucket = ? LIMIT ?",
+                    (band, bucket, MAX_CANDIDATES)
+                ).fetchall()
+                candidates.update(row[0] for row in rows)
+                if len(candidates) >= MAX_CANDIDATES:
+                    break
+            if not candidates:
+                return None
+            placeholders = ','.join('?' * len(candidates))
+            rows = self._db.execute(
+                f"SELECT id, user_id, question_id, signature, score, evaluation FROM answers WHERE id IN ({placeholders})",
+                list(candidates)
+            ).fetchall()
+
+        best = None
+        for answer_id, user_id, stored_question_id, stored_signature, score, evaluation in rows:
+            similarity = float(np.mean(np.frombuffer(stored_signature, dtype=np.uint32) == signature))
+            key = (similarity, stored_question_id == question_id)
+            if similarity >= DUPLICATE_THRESHOLD and (best is None or key > best[0]):
+                best = (key, {
+                    'answer_id': answer_id,
+                    'user_id': user_id,
+                    'question_id': stored_question_id,
+                    'similarity': similarity,
+                    'score': score,
+                    'evaluation': json.loads(evaluation) if evaluation else None
+                })
+        return best[1] if best else None
+
+@lru_cache(maxsize=None)
+def get_answer_index(path=None):
+    """Shared answer index (once per process)"""
+    os.makedirs(STORAGE_CONFIG['data_dir'], exist_ok=True)
+    return AnswerIndex(path or os.path.join(STORAGE_CONFIG['data_dir'], ANSWER_INDEX_FILE))
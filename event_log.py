@@ -0,0 +1,84 @@
+import sys
+import time
+from array import array
+
+# Event kinds; append only, the codes are stored with sessions
+SHOWN = 0  # Question displayed
+ANSWER_STARTED = 1  # First time the answer box had text (Streamlit reports edits, not single keystrokes)
+EVALUATED = 2
+NEXT = 3
+PREVIOUS = 4
+SKIPPED = 5
+TIME_UP = 6  # Per-question time limit reached
+FINISHED = 7
+EVENT_NAMES = ['shown', 'answer_started', 'evaluated', 'next', 'previous', 'skipped', 'time_up', 'finished']
+
+# Events kept per interview; the oldest are overwritten beyond this, so state that must survive
+# a long interview (time per question, time-ups) is kept on InterviewState instead
+EVENT_CAPACITY = 128
+
+class EventLog:
+    """Fixed-size ring buffer of (seconds since start, kind, question index) events
+
+    This is the detailed trail saved with a session, not the source of truth while it runs.
+    Times come from time.monotonic(), so wall-clock changes never skew them, and are kept
+    relative to the log's start in preallocated float32/byte arrays (6 bytes per event).
+    """
+    __slots__ = ('origin', 'offsets', 'kinds', 'questions', 'count')
+
+    def __init__(self, capacity=EVENT_CAPACITY):
+        self.origin = time.monotonic()
+        self.offsets = array('f', bytes(4 * capacity))
+        self.kinds = array('B', bytes(capacity))
+        self.questions = array('B', bytes(capacity))
+        self.count = 0  # Events recorded so far, including overwritten ones
+
+    def record(self, kind, question):
+        i = self.count % len(self.kinds)
+        self.offsets[i] = time.monotonic() - self.origin
+        self.kinds[i] = kind
+        self.questions[i] = question
+        self.count += 1
+
+    def elapsed(self):
+        """Seconds since the log started, on the same clock as the events"""
+        return time.monotonic() - self.origin
+
+    def events(self):
+        """Retained events as (seconds, kind, question) tuples, oldest first"""
+        capacity = len(self.kinds)
+        start = max(0, self.count - capacity)
+        return [(self.offsets[i % capacity], self.kinds[i % capacity], self.questions[i % capacity])
+                for i in range(start, self.count)]
+
+    def has(self, kind, question):
+        """Whether a retained event of a kind was recorded for a question"""
+        capacity = len(self.kinds)
+        return any(self.kinds[i % capacity] == kind and self.questions[i % capacity] == question
+                   for i in range(max(0, self.count - capacity), self.count))
+
+    def to_list(self):
+        """Events as [seconds, kind, question] lists, for saving with the session"""
+        return [[round(offset, 3), kind, question] for offset, kind, question in self.events()]
+
+    def footprint(self):
+        """Approximate bytes held by the log"""
+        return sys.getsizeof(self) + sum(sys.getsizeof(buffer) for buffer in (self.offsets, self.kinds, self.questions))
+
+def time_on_questions(events, n_questions, end=None):
+    """Seconds spent on each question (None if never shown), from chronological events
+
+    A question's time runs from when it is shown until another question is shown or the
+    interview finishes; end (seconds) closes a question that is still on screen.
+    """
+    seconds = [None] * n_questions
+    current = since = None
+    for offset, kind, question in events:
+        if kind in (SHOWN, FINISHED) and current is not None:
+            seconds[current] = (seconds[current] or 0.0) + offset - since
+            current = None
+        if kind == SHOWN and question < n_questions:
+            current, since = question, offset
+    if current is not None and end is not None:
+        seconds[current] = (seconds[current] or 0.0) + end - since
+    return seconds
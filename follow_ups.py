@@ -0,0 +1,152 @@
+import sys
+import json
+import zlib
+import random
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+FOLLOW_UP_TEMPLATES_FILE = "follow_up_templates.json"
+DEFAULT_FOLLOW_UP = "Can you elaborate on that point?"
+
+class FollowUpIndex:
+    """Follow-up templates per role, with inverted indexes from keyword tags to templates
+
+    A template's "mentioned" tags make it a probe into a topic the answer brought up; its
+    "missing" tags make it a prompt for a topic the question expects but the answer left out.
+    Template positions are stored with evaluations, so templates are only ever appended.
+    """
+    def __init__(self, templates):
+        self.texts = {}
+        self.mentioned = {}  # role -> keyword -> indexes of templates probing it
+        self.missing = {}  # role -> keyword -> indexes of templates asking for it
+        self.untagged = {}  # role -> indexes of templates asked when no tag matches
+        for role, entries in templates.items():
+            self.texts[role] = [entry['text'] for entry in entries]
+            mentioned = self.mentioned[role] = {}
+            missing = self.missing[role] = {}
+            for i, entry in enumerate(entries):
+                for term in entry.get('mentioned', ()):
+                    mentioned.setdefault(term, set()).add(i)
+                for term in entry.get('missing', ()):
+                    missing.setdefault(term, set()).add(i)
+            self.untagged[role] = [i for i, entry in enumerate(entries) if not entry.get('mentioned') and not entry.get('missing')]
+
+    def choose(self, role, detected=frozenset(), expected=frozenset()):
+        """Index of the follow-up that best fits an answer, or None if the role has none
+
+        detected are the keywords found in the answer and expected those the question calls
+        for. Templates for expected-but-missing keywords come first, then probes into detected
+        ones, each ranked by how many of their tags match; ties are broken at random.
+        """
+        if not self.texts.get(role):
+            return None
+        hits = Counter()
+        missing = self.missing[role]
+        for term in (expected - detected) & missing.keys():
+            hits.update(missing[term])
+        if not hits:
+            mentioned = self.mentioned[role]
+            for term in detected & mentioned.keys():
+                hits.update(mentioned[term])
+        if hits:
+            best = max(hits.values())
+            return random.choice([i for i, count in hits.items() if count == best])
+        return random.choice(self.untagged[role] or range(len(self.texts[role])))
+
+    def tags(self, role, index):
+        """Every keyword a follow-up is tagged with, mentioned or missing"""
+        return frozenset(term for by_term in (self.mentioned.get(role, {}), self.missing.get(role, {}))
+                         for term, indexes in by_term.items() if index in indexes)
+
+    def text(self, role, index):
+        """Text of a follow-up by role and index"""
+        texts = self.texts.get(role)
+        if texts and index is not None and index < len(texts):
+            return texts[index]
+        return DEFAULT_FOLLOW_UP
+
+@lru_cache(maxsize=None)
+def load_follow_up_index(path=FOLLOW_UP_TEMPLATES_FILE):
+    """Load the tagged follow-up templates and index them (once per process)"""
+    with open(path) as f:
+        return FollowUpIndex(json.load(f))
+
+def _digest(answer):
+    return zlib.crc32(answer.encode('utf-8'))
+
+class FollowUpThread:
+    """Follow-up turns answered under one interview question
+
+    A turn keeps the index of the follow-up it answers, never its text or the parent question's;
+    both are looked up when needed. Each evaluation is stored with a CRC of the answer it
+    scored, so re-evaluating the thread only re-scores turns whose answer changed since.
+    """
+    __slots__ = ('prompts', 'answers', 'evaluations', 'digests')
+
+    def __init__(self, prompt):
+        self.prompts = array('B', [prompt])  # Follow-up template index per turn
+        self.answers = [""]
+        self.evaluations = [None]
+        self.digests = array('I', [0])  # CRC of the answer each evaluation scored
+
+    def __len__(self):
+        return len(self.prompts)
+
+    def open(self, prompt):
+        """Add a turn for the next follow-up"""
+        self.prompts.append(prompt)
+        self.answers.append("")
+        self.evaluations.append(None)
+        self.digests.append(0)
+
+    def answered(self):
+        """Whether any turn has an answer"""
+        return any(answer.strip() for answer in self.answers)
+
+    def stale(self):
+        """Turns whose evaluation no longer matches their answer"""
+        stale = []
+        for i, answer in enumerate(self.answers):
+            if not answer.strip():
+                if self.evaluations[i] is not None:
+                    stale.append(i)
+            elif self.evaluations[i] is None or self.digests[i] != _digest(answer):
+                stale.append(i)
+        return stale
+
+    def evaluate(self, score_turn):
+        """Re-score the stale turns with score_turn(prompt, answer); returns their indexes
+
+        Cleared answers drop their evaluation; every other turn keeps its cached one.
+        """
+        stale = self.stale()
+        for i in stale:
+            answer = self.answers[i]
+            self.evaluations[i] = score_turn(self.prompts[i], answer) if answer.strip() else None
+            self.digests[i] = _digest(answer)
+        return stale
+
+    @property
+    def scores(self):
+        """Score of each turn, None where not evaluated"""
+        return [evaluation['score'] if evaluation else None for evaluation in self.evaluations]
+
+    def to_list(self, role, index=None):
+        """Answered turns as follow-up dicts, for saving with the session's question"""
+        index = index or load_follow_up_index()
+        return [{
+            'follow_up': prompt,
+            'question': index.text(role, prompt),
+            'answer': answer,
+            'evaluation': evaluation,
+            'score': evaluation['score'] if evaluation else None
+        } for prompt, answer, evaluation in zip(self.prompts, self.answers, self.evaluations) if answer.strip()]
+
+    def footprint(self):
+        """Approximate bytes held by the thread"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.prompts) + sys.getsizeof(self.digests)
+        size += sys.getsizeof(self.answers) + sum(sys.getsizeof(answer) for answer in self.answers)
+        size += sys.getsizeof(self.evaluations)
+        size += sum(sys.getsizeof(evaluation) for evaluation in self.evaluations if evaluation)
+        return size
@@ -1,49 +1,23 @@
 import random
-import os
 import re
-from dotenv import load_dotenv
+from functools import lru_cache
+from question_bank import load_question_bank
+from adaptive import get_adaptive_selector
+from calibration import get_calibration_index
+from duplicates import get_answer_index
+from config import FEEDBACK_CONFIG
+from answer_pipeline import preprocess_answer, count_tech_terms
+from follow_ups import load_follow_up_index
+from rubrics import get_rubric, SHORT_ANSWER_CHARS, SHORT_ANSWER_SCORE
+from shadow import ShadowScorer
 
-load_dotenv()
+EVALUATION_FIELDS = ('score', 'feedback_type', 'style', 'template', 'follow_up', 'difficulty', 'role')
 
 # Local evaluation system - no OpenAI required
 class LocalInterviewEvaluator:
     def __init__(self):
-        self.keyword_scores = {
-            # Technical keywords with positive scores
-            'algorithm': 2, 'optimization': 2, 'efficiency': 2, 'performance': 2,
-            'architecture': 2, 'design pattern': 2, 'best practice': 2, 'scalability': 2,
-            'testing': 1, 'debug': 1, 'troubleshoot': 1, 'maintenance': 1,
-            'documentation': 1, 'code review': 1, 'version control': 1, 'git': 1,
-            'database': 1, 'api': 1, 'framework': 1, 'library': 1,
-            
-            # Java-specific keywords
-            'oop': 2, 'inheritance': 2, 'polymorphism': 2, 'encapsulation': 2,
-            'interface': 2, 'abstract': 2, 'static': 1, 'final': 1,
-            'exception': 1, 'thread': 2, 'concurrency': 2, 'synchronization': 2,
-            'garbage collection': 2, 'jvm': 2, 'bytecode': 1, 'spring': 1,
-            
-            # AI/ML keywords
-            'machine learning': 2, 'neural network': 2, 'deep learning': 2,
-            'supervised': 1, 'unsupervised': 1, 'regression': 1, 'classification': 1,
-            'overfitting': 2, 'cross-validation': 2, 'feature engineering': 2,
-            'bias-variance': 2, 'gradient descent': 2, 'optimization': 2,
-            'tensorflow': 1, 'pytorch': 1, 'scikit-learn': 1, 'pandas': 1,
-            
-            # Frontend keywords
-            'html': 1, 'css': 1, 'javascript': 1, 'react': 2, 'vue': 1, 'angular': 1,
-            'dom': 1, 'responsive': 1, 'accessibility': 1, 'seo': 1,
-            'performance': 2, 'optimization': 2, 'browser': 1, 'cross-browser': 1,
-            
-            # Data Science keywords
-            'statistics': 1, 'probability': 1, 'hypothesis': 1, 'p-value': 1,
-            'correlation': 1, 'causation': 1, 'outlier': 1, 'missing data': 1,
-            'data cleaning': 1, 'exploratory': 1, 'visualization': 1, 'dashboard': 1,
-            'a/b testing': 2, 'experiment': 1, 'sample': 1, 'population': 1,
-            
-            # Negative keywords (reduce score)
-            'dont know': -2, 'not sure': -1, 'maybe': -1, 'probably': -1,
-            'i think': -1, 'i guess': -1, 'kind of': -1, 'sort of': -1
-        }
+        # Live scoring rubric: role keyword points, length bonus and difficulty multipliers
+        self.rubric = get_rubric(FEEDBACK_CONFIG['rubric'])
         
         # Multiple feedback styles for variety
         self.feedback_styles = {
@@ -153,57 +127,22 @@ class LocalInterviewEvaluator:
             }
         }
         
-        self.follow_up_templates = {
-            'Java Developer': [
-                "Can you elaborate on how you would implement this in a production environment?",
-                "What are the performance implications of this approach?",
-                "How would you handle edge cases in this scenario?",
-                "Can you explain the trade-offs between different approaches?",
-                "What testing strategies would you use for this implementation?"
-            ],
-            'AI Engineer': [
-                "How would you handle data quality issues in this scenario?",
-                "What metrics would you use to evaluate this model's performance?",
-                "How would you scale this solution for larger datasets?",
-                "What are the potential biases in this approach?",
-                "How would you deploy this model in production?"
-            ],
-            'Frontend Developer': [
-                "How would you optimize this for mobile devices?",
-                "What accessibility considerations should be taken into account?",
-                "How would you handle browser compatibility issues?",
-                "What performance optimizations would you implement?",
-                "How would you structure this for maintainability?"
-            ],
-            'Data Scientist': [
-                "How would you validate these findings?",
-                "What additional data sources would you consider?",
-                "How would you communicate these results to stakeholders?",
-                "What are the limitations of this analysis?",
-                "How would you handle missing or inconsistent data?"
-            ]
-        }
+        # Follow-ups tagged with the keywords they probe or ask for, indexed once
+        self.follow_ups = load_follow_up_index()
 
     def evaluate_answer(self, question, answer, difficulty="Medium", role="Developer"):
         """Evaluate answer using local keyword analysis and templates"""
-        if not answer or len(answer.strip()) < 10:
-            return self._generate_feedback('poor', difficulty, role, 2)
-        
-        # Calculate base score from keywords
-        score = self._calculate_keyword_score(answer.lower())
-        
-        # Adjust for answer length and structure
-        length_bonus = min(len(answer.split()) / 50, 2)  # Bonus for longer answers
-        score += length_bonus
-        
-        # Adjust for difficulty
-        if difficulty == "Hard":
-            score *= 0.8  # Harder questions get stricter scoring
-        elif difficulty == "Easy":
-            score *= 1.2  # Easier questions get more lenient scoring
+        return self.render_feedback(self.score_answer(question, answer, difficulty, role))
+    
+    def score_answer(self, question, answer, difficulty="Medium", role="Developer", question_id=None, expected=None):
+        """Score an answer and pick its feedback templates without rendering them
         
-        # Normalize score to 1-10 range
-        score = max(1, min(10, int(score + 5)))
+        With a question_id, strictness follows the question's calibrated difficulty. expected
+        overrides the keywords the question calls for, which pick the follow-up.
+        """
+        score, signals = self.rubric_score(answer, difficulty, role, question_id)
+        if signals is None:
+            return self._make_evaluation('poor', difficulty, role, score, self.follow_ups.choose(role), score)
         
         # Generate feedback based on score
         if score >= 8:
@@ -215,21 +154,87 @@ class LocalInterviewEvaluator:
         else:
             feedback_type = 'poor'
         
-        return self._generate_feedback(feedback_type, difficulty, role, score)
+        # Follow up on what the answer covered, or on what the question called for and it missed
+        if expected is None:
+            expected = self.expected_keywords(question, role, question_id)
+        follow_up = self.follow_ups.choose(role, signals['keywords'], expected)
+        return self._make_evaluation(feedback_type, difficulty, role, score, follow_up, signals['raw_score'])
     
-    def _calculate_keyword_score(self, answer):
-        """Calculate score based on keyword presence"""
-        score = 0
-        for keyword, points in self.keyword_scores.items():
-            if keyword in answer:
-                score += points
-        return score
+    def score_follow_up(self, role, follow_up, answer, difficulty="Medium"):
+        """Score an answer to a follow-up, which calls for the keywords it is tagged with"""
+        return self.score_answer(self.follow_ups.text(role, follow_up), answer, difficulty, role,
+                                 expected=self.follow_ups.tags(role, follow_up) or None)
     
-    def _generate_feedback(self, feedback_type, difficulty, role, score):
-        """Generate detailed feedback using multiple styles"""
+    def rubric_score(self, answer, difficulty="Medium", role="Developer", question_id=None, rubric=None):
+        """Score an answer under a rubric (the live one by default); returns (score, signals)
+        
+        Signals are None for answers too short to analyze. Their raw_score is the score before
+        the difficulty multiplier, which is what calibration measures.
+        """
+        rubric = rubric or self.rubric
+        if not answer or len(answer.strip()) < SHORT_ANSWER_CHARS:
+            return SHORT_ANSWER_SCORE, None
+        
+        signals = self.analyze(answer, role, rubric)
+        
+        # Hedging costs points and assertive, structured answers earn them, relative to answer length
+        adjustment = signals['confidence']['score_adjustment'] if signals['confidence'] else 0
+        
+        # Difficulty is measured from past scores once there are enough of them; harder questions get stricter scoring
+        level = get_calibration_index().difficulty_level(question_id, difficulty) if question_id else difficulty
+        signals['raw_score'] = rubric.score(signals['keyword_score'], signals['length_bonus'], adjustment, None)
+        return rubric.score(signals['keyword_score'], signals['length_bonus'], adjustment, level), signals
+    
+    def get_matcher(self, role):
+        """Get the live rubric's keyword matcher for a role (generic terms for unknown roles)"""
+        return self.rubric.get_matcher(role)
+    
+    def analyze(self, answer, role="Developer", rubric=None):
+        """Compute every scoring signal from one shared preprocessing pass"""
+        rubric = rubric or self.rubric
+        features = preprocess_answer(answer)
+        matcher = rubric.get_matcher(role)
+        keywords = matcher.find(features.text)
+        return {
+            'word_count': features.word_count,
+            'char_count': features.char_count,
+            'keywords': keywords,
+            'keyword_score': sum(matcher.keyword_scores[term] for term in keywords),
+            'length_bonus': rubric.length_bonus(features.word_count),  # Bonus for longer answers
+            'tech_depth': count_tech_terms(features),
+            # Hedging, assertiveness and STAR structure; None when confidence analysis is off
+            'confidence': rubric.confidence_analyzer.analyze(features) if FEEDBACK_CONFIG['confidence_analysis'] else None
+        }
+    
+    def expected_keywords(self, question, role, question_id=None):
+        """Keywords a question calls for: its "keywords" in the bank, else the role's terms in its text"""
+        record = load_question_bank().get(question_id) if question_id else None
+        if record and record['keywords']:
+            return frozenset(record['keywords'])
+        return frozenset(self.get_matcher(role).find((question or '').lower()))
+    
+    def _make_evaluation(self, feedback_type, difficulty, role, score, follow_up, raw_score):
+        """Pick the feedback style and templates for a score; their ids are enough to re-render it"""
         # Randomly select a feedback style for variety
         style = random.choice(list(self.feedback_styles.keys()))
-        main_feedback = random.choice(self.feedback_styles[style][feedback_type])
+        return {
+            'score': score,
+            'feedback_type': feedback_type,
+            'style': style,
+            'template': random.randrange(len(self.feedback_styles[style][feedback_type])),
+            'follow_up': follow_up,
+            'difficulty': difficulty,
+            'role': role,
+            'rubric': self.rubric.id,
+            'raw_score': raw_score
+        }
+    
+    def render_feedback(self, evaluation):
+        """Generate detailed feedback markdown for a structured evaluation"""
+        score = evaluation['score']
+        style = evaluation['style']
+        difficulty = evaluation['difficulty']
+        main_feedback = self.feedback_styles[style][evaluation['feedback_type']][evaluation['template']]
         
         # Create a comprehensive feedback response
         feedback = f"""
@@ -254,7 +259,7 @@ class LocalInterviewEvaluator:
 {self._get_improvements_detailed(score, style)}
 
 ### 🤔 **Follow-up Challenge**
-{self._get_follow_up(role)}
+{self._get_follow_up_text(evaluation['role'], evaluation['follow_up'])}
 
 ### 💡 **Pro Tips**
 {self._get_pro_tips(score, difficulty, style)}
@@ -441,44 +446,117 @@ class LocalInterviewEvaluator:
         
         return "\n".join(tips)
 
-    def _get_follow_up(self, role):
-        if role in self.follow_up_templates:
-            return random.choice(self.follow_up_templates[role])
-        return "Can you elaborate on that point?"
+    def _get_follow_up(self, role, question="", answer="", question_id=None):
+        detected = self.get_matcher(role).find((answer or '').lower())
+        index = self.follow_ups.choose(role, detected, self.expected_keywords(question, role, question_id))
+        return self.follow_ups.text(role, index)
+    
+    def _get_follow_up_text(self, role, index):
+        return self.follow_ups.text(role, index)
 
 # Initialize the local evaluator
 local_evaluator = LocalInterviewEvaluator()
 
-def get_questions_for_session(role, difficulty="Mixed", n=5):
-    """Get questions for a session with specified difficulty level"""
-    import json
-    with open("question_bank.json") as f:
-        question_bank = json.load(f)
+# Initialize the adaptive question scheduler; the analytics save writer records saved sessions into it
+adaptive_selector = get_adaptive_selector()
+
+def _start_shadow_scorer(rubric_id):
+    rubric = get_rubric(rubric_id)
+    return ShadowScorer(rubric.id, lambda answer, difficulty, role, question_id:
+                        local_evaluator.rubric_score(answer, difficulty, role, question_id, rubric)[0])
+
+# Candidate rubric scoring live answers in the background, if one is configured
+shadow_scorer = _start_shadow_scorer(FEEDBACK_CONFIG['shadow_rubric']) if FEEDBACK_CONFIG['shadow_rubric'] is not None else None
+
+def get_questions_for_session(role, difficulty="Mixed", n=5, user_id=None, style="Standard"):
+    """Get questions for a session with specified difficulty level and interview style
+    
+    With a user_id, questions are picked adaptively from that user's past performance.
+    Styles with too few matching questions are topped up from the standard pool.
+    """
+    question_bank = load_question_bank()
     
-    if role not in question_bank:
+    if role not in question_bank.by_role:
         return []
     
-    role_questions = question_bank[role]
+    if user_id is not None:
+        selected = adaptive_selector.select(user_id, role, difficulty, n, style)
+        return [{"id": q["id"], "question": q["question"], "difficulty": q["difficulty"]} for q in selected]
     
-    if difficulty == "Mixed":
-        # Mix questions from all difficulty levels
-        all_questions = []
-        for diff in ["Easy", "Medium", "Hard"]:
-            if diff in role_questions:
-                all_questions.extend([(q, diff) for q in role_questions[diff]])
-        selected = random.sample(all_questions, min(n, len(all_questions)))
-        return [{"question": q, "difficulty": d} for q, d in selected]
-    else:
-        # Get questions from specific difficulty level
-        if difficulty in role_questions:
-            questions = random.sample(role_questions[difficulty], min(n, len(role_questions[difficulty])))
-            return [{"question": q, "difficulty": difficulty} for q in questions]
-        return []
+    pool = question_bank.get_pool(role, style, difficulty)
+    selected = random.sample(pool, min(n, len(pool)))
+    if len(selected) < n and style != "Standard":
+        chosen = {q["id"] for q in selected}
+        remaining = [q for q in question_bank.get_pool(role, "Standard", difficulty) if q["id"] not in chosen]
+        selected.extend(random.sample(remaining, min(n - len(selected), len(remaining))))
+    return [{"id": q["id"], "question": q["question"], "difficulty": q["difficulty"]} for q in selected]
+
+def record_session_results(user_id, session_data):
+    """Update the user's adaptive selection statistics with a finished session that is not being saved"""
+    adaptive_selector.record_session(user_id, session_data)
+
+def get_question_hint(question_id):
+    """Get the precomputed hint for a question"""
+    return load_question_bank().get_hint(question_id)
 
 def evaluate_answer(question, answer, difficulty="Medium", role="Developer"):
     """Evaluate the user's answer using local AI (no OpenAI required)"""
     return local_evaluator.evaluate_answer(question, answer, difficulty, role)
 
+def score_answer(question, answer, difficulty="Medium", role="Developer", question_id=None):
+    """Evaluate the user's answer into a structured result (score, style, template ids)
+    
+    Near-duplicates of stored answers are flagged under 'duplicate'; for the same question
+    the stored evaluation is reused, so a canned answer always gets the same result. Freshly
+    scored answers are also queued for the shadow rubric, if one is configured.
+    """
+    duplicate = None
+    if FEEDBACK_CONFIG['duplicate_detection']:
+        duplicate = get_answer_index().find_duplicate(answer, question_id)
+    
+    if duplicate and question_id and duplicate['question_id'] == question_id and duplicate['evaluation']:
+        evaluation = {field: duplicate['evaluation'][field] for field in EVALUATION_FIELDS}
+        evaluation.update(difficulty=difficulty, role=role, rubric=duplicate['evaluation'].get('rubric'),
+                          raw_score=duplicate['evaluation'].get('raw_score'))
+    else:
+        evaluation = local_evaluator.score_answer(question, answer, difficulty, role, question_id)
+        if shadow_scorer:
+            shadow_scorer.submit(answer, difficulty, role, question_id, evaluation)
+    
+    if duplicate:
+        evaluation['duplicate'] = {
+            'similarity': duplicate['similarity'],
+            'same_question': duplicate['question_id'] == question_id
+        }
+    return evaluation
+
+def score_follow_up(role, follow_up, answer, difficulty="Medium"):
+    """Evaluate an answer to a follow-up question (by template index) into a structured result"""
+    return local_evaluator.score_follow_up(role, follow_up, answer, difficulty)
+
+@lru_cache(maxsize=4096)
+def _render_feedback_cached(evaluation_key):
+    return local_evaluator.render_feedback(dict(zip(EVALUATION_FIELDS, evaluation_key)))
+
+def render_feedback(evaluation):
+    """Render the feedback markdown for a structured evaluation
+    
+    Rendering is deterministic, so the text is shared by every session through one cache.
+    """
+    return _render_feedback_cached(tuple(evaluation.get(field) for field in EVALUATION_FIELDS))
+
+def get_evaluation_follow_up(evaluation):
+    """Get the follow-up question picked for a structured evaluation"""
+    return local_evaluator._get_follow_up_text(evaluation['role'], evaluation['follow_up'])
+
+def get_follow_up_text(role, follow_up):
+    """Get a follow-up question's text by its template index"""
+    return local_evaluator._get_follow_up_text(role, follow_up)
+
+def analyze_answer(answer, role="Developer"):
+    """Get the live scoring signals (word count, confidence, tech depth, ...) for an answer"""
+    return local_evaluator.analyze(answer, role)
+
 def extract_score_from_feedback(feedback):
     """Extract the numerical score from feedback"""
     if not feedback:
@@ -502,4 +580,4 @@ def extract_score_from_feedback(feedback):
 
 def get_follow_up_question(original_question, user_answer, difficulty="Medium", role="Developer"):
     """Generate a follow-up question based on the user's answer"""
-    return local_evaluator._get_follow_up(role) 
\ No newline at end of file
+    return local_evaluator._get_follow_up(role, original_question, user_answer) 
\ No newline at end of file
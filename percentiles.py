@@ -0,0 +1,110 @@
+import os
+import json
+import threading
+from functools import lru_cache
+from config import STORAGE_CONFIG
+
+PERCENTILES_FILE = "percentiles.json"
+ALL_DIFFICULTIES = "All"
+MIN_COHORT = 10  # Sessions a cohort needs before its percentiles are shown
+
+# Question scores are integers 1-10 and session averages are binned to 0.1 between 1.0 and 10.0,
+# so fixed-bin histograms are exact quantile sketches: lookups scan a constant number of bins and
+# merging shards is adding counts.
+SCORE_BINS = 11
+AVERAGE_BINS = 91
+
+def average_bin(average):
+    return min(AVERAGE_BINS - 1, max(0, int(round((average - 1.0) * 10))))
+
+class PercentileIndex:
+    """Score distributions per role x difficulty (session averages) and per role x question (scores)"""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.cohorts = {}  # "role|difficulty" -> histogram of per-session average scores
+        self.questions = {}  # "role|question id" -> histogram of scores
+        self.applied_seq = 0  # Save spool seq of the last session added
+        self.on_disk = os.path.exists(path)
+        if self.on_disk:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.cohorts = data['cohorts']
+            self.questions = data['questions']
+            self.applied_seq = data.get('applied_seq', 0)
+
+    def _histogram(self, table, key, bins):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = [0] * bins
+        return histogram
+
+    def _add_session(self, session_data):
+        self.applied_seq = max(self.applied_seq, session_data.get('seq', 0))
+        role = session_data.get('role') or ''
+        by_difficulty = {}
+        for q_data in session_data['questions']:
+            score = q_data.get('score')
+            if not score:
+                continue
+            by_difficulty.setdefault(q_data.get('difficulty'), []).append(score)
+            by_difficulty.setdefault(ALL_DIFFICULTIES, []).append(score)
+            if q_data.get('id'):
+                self._histogram(self.questions, f"{role}|{q_data['id']}", SCORE_BINS)[score] += 1
+        for difficulty, scores in by_difficulty.items():
+            self._histogram(self.cohorts, f"{role}|{difficulty}", AVERAGE_BINS)[average_bin(sum(scores) / len(scores))] += 1
+
+    def add_sessions(self, sessions):
+        """Fold newly stored sessions into the distributions"""
+        with self._lock:
+            for session_data in sessions:
+                self._add_session(session_data)
+
+    def rebuild(self, sessions):
+        """Recompute everything from a stream of sessions"""
+        with self._lock:
+            self.cohorts = {}
+            self.questions = {}
+            self.applied_seq = 0
+            for session_data in sessions:
+                self._add_session(session_data)
+
+    def merge(self, other):
+        """Add another index's counts (e.g. from another shard or worker process) into this one"""
+        with self._lock:
+            self.applied_seq = max(self.applied_seq, other.applied_seq)
+            for table, other_table in ((self.cohorts, other.cohorts), (self.questions, other.questions)):
+                for key, counts in other_table.items():
+                    histogram = self._histogram(table, key, len(counts))
+                    for i, count in enumerate(counts):
+                        histogram[i] += count
+
+    def save(self):
+        with self._lock:
+            data = json.dumps({'cohorts': self.cohorts, 'questions': self.questions, 'applied_seq': self.applied_seq})
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, 'w') as f:
+            f.write(data)
+        os.replace(tmp_file, self.path)
+        self.on_disk = True
+
+    def _rank(self, histogram, index):
+        if histogram is None:
+            return None
+        total = sum(histogram)
+        if total < MIN_COHORT:
+            return None
+        return {'percentile': 100.0 * sum(histogram[:index]) / total, 'cohort_size': total}
+
+    def session_percentile(self, role, difficulty, average):
+        """Share (%) of sessions in the role x difficulty cohort that averaged strictly lower, or None"""
+        return self._rank(self.cohorts.get(f"{role}|{difficulty}"), average_bin(average))
+
+    def question_percentile(self, role, question_id, score):
+        """Share (%) of scores on a question that were strictly lower, or None"""
+        return self._rank(self.questions.get(f"{role}|{question_id}"), score)
+
+@lru_cache(maxsize=None)
+def get_percentile_index(path=None):
+    """Shared percentile index (once per process)"""
+    return PercentileIndex(path or os.path.join(STORAGE_CONFIG['data_dir'], PERCENTILES_FILE))
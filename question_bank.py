@@ -0,0 +1,125 @@
+import json
+import hashlib
+from functools import lru_cache
+
+QUESTION_BANK_FILE = "question_bank.json"
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+
+# Hint rules, checked in order against the lowercased question at load time
+HINT_RULES = [
+    (('algorithm', 'complexity'), "Think about time and space complexity, and consider different approaches."),
+    (('design', 'architecture'), "Consider scalability, maintainability, and trade-offs between different approaches."),
+    (('experience', 'project'), "Use the STAR method: Situation, Task, Action, Result."),
+    (('problem', 'challenge'), "Break down the problem, explain your approach, and discuss potential solutions."),
+    (('team', 'collaboration'), "Focus on communication, conflict resolution, and achieving common goals."),
+]
+DEFAULT_HINT = "Provide specific examples and explain your reasoning clearly."
+
+# Question type rules, checked in order against the lowercased question at load time
+QUESTION_TYPE_RULES = [
+    ('behavioral', ('tell me about', 'describe a', 'a time you', 'imagine', 'stakeholder',
+                    'non-technical', 'stay updated', 'your experience')),
+    ('system_design', ('design a', 'design an', 'architecture', 'scal', 'millions of',
+                       'production', 'optimiz', 'performance')),
+]
+DEFAULT_QUESTION_TYPE = 'technical'
+QUICK_FIRE_MAX_WORDS = 10
+
+INTERVIEW_STYLES = ["Standard", "Behavioral Focus", "Technical Deep Dive", "System Design", "Quick Fire"]
+
+def matches_style(record, style):
+    """Whether a question record belongs in an interview style's pool"""
+    if style == "Behavioral Focus":
+        return record["type"] == 'behavioral'
+    if style == "Technical Deep Dive":
+        return record["type"] == 'technical'
+    if style == "System Design":
+        return record["type"] == 'system_design'
+    if style == "Quick Fire":
+        return record["type"] != 'behavioral' and len(record["question"].split()) <= QUICK_FIRE_MAX_WORDS
+    return True
+
+def make_question_id(role, question):
+    """Stable id for a question, derived from its role and text"""
+    return hashlib.sha1(f"{role}|{question}".encode("utf-8")).hexdigest()[:12]
+
+def generate_hint(question):
+    """Generate a helpful hint based on question content"""
+    question_lower = question.lower()
+    for words, hint in HINT_RULES:
+        if any(word in question_lower for word in words):
+            return hint
+    return DEFAULT_HINT
+
+def classify_question(question):
+    """Classify a question as behavioral, system_design or technical"""
+    question_lower = question.lower()
+    for question_type, phrases in QUESTION_TYPE_RULES:
+        if any(phrase in question_lower for phrase in phrases):
+            return question_type
+    return DEFAULT_QUESTION_TYPE
+
+class QuestionBank:
+    """Question bank indexed by id, with per-question data computed once at load"""
+    def __init__(self, raw_bank):
+        self.roles = list(raw_bank.keys())
+        self.by_id = {}
+        self.by_role = {}
+
+        for role, levels in raw_bank.items():
+            self.by_role[role] = {}
+            for difficulty, entries in levels.items():
+                records = []
+                for entry in entries:
+                    # Entries are plain strings, or objects with optional "id"/"hint"/"type" overrides
+                    # and "keywords" a good answer should mention
+                    if isinstance(entry, str):
+                        entry = {"question": entry}
+                    text = entry["question"]
+                    record = {
+                        "id": entry.get("id") or make_question_id(role, text),
+                        "question": text,
+                        "difficulty": difficulty,
+                        "role": role,
+                        "hint": entry.get("hint") or generate_hint(text),
+                        "type": entry.get("type") or classify_question(text),
+                        "keywords": tuple(entry.get("keywords", ()))
+                    }
+                    self.by_id[record["id"]] = record
+                    records.append(record)
+                self.by_role[role][difficulty] = records
+
+        # Ready-made pools per (role, style, difficulty), "Mixed" included, so that
+        # sampling a session is an O(k) pick with no filtering at session start
+        self.pools = {}
+        for role, levels in self.by_role.items():
+            for style in INTERVIEW_STYLES:
+                mixed = []
+                for difficulty, records in levels.items():
+                    pool = [record for record in records if matches_style(record, style)]
+                    self.pools[(role, style, difficulty)] = pool
+                    mixed.extend(pool)
+                self.pools[(role, style, "Mixed")] = mixed
+
+    def get(self, question_id):
+        """Get a question record by id"""
+        return self.by_id.get(question_id)
+
+    def get_hint(self, question_id):
+        """Get the precomputed hint for a question"""
+        record = self.by_id.get(question_id)
+        return record["hint"] if record else DEFAULT_HINT
+
+    def get_questions(self, role, difficulty):
+        """Get the question records for a role and difficulty level"""
+        return self.by_role.get(role, {}).get(difficulty, [])
+
+    def get_pool(self, role, style, difficulty):
+        """Get the precomputed question pool for a role, interview style and difficulty (or "Mixed")"""
+        return self.pools.get((role, style, difficulty), [])
+
+@lru_cache(maxsize=None)
+def load_question_bank(path=QUESTION_BANK_FILE):
+    """Load and index the question bank (once per process)"""
+    with open(path) as f:
+        return QuestionBank(json.load(f))
@@ -0,0 +1,205 @@
+import os
+import json
+import html
+import time
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from config import ANALYTICS_CONFIG, BRAND_CONFIG
+from storage import safe_user_id
+from analytics import InterviewAnalytics
+
+PLOTLY_JS_FILE = "plotly.min.js"
+CHARTS_JS_FILE = "report_charts.js"
+INDEX_FILE = "index.html"
+CHUNK_SIZE = 8  # Candidates handed to a worker at a time
+PROGRESS_EVERY = 50
+
+# Every page draws its charts from templates in the shared CHARTS_JS_FILE, so the Plotly layouts
+# are built once per run instead of once per page and each page only carries its own data points.
+CHARTS_JS = """var CHART_TEMPLATES = %s;
+function drawChart(name, x, y) {
+    var template = CHART_TEMPLATES[name];
+    var data = template.data.map(function (trace) {
+        var filled = Object.assign({}, trace, {x: x, y: y});
+        if (trace.marker && trace.marker.coloraxis) {
+            filled.marker = Object.assign({}, trace.marker, {color: y});  // Bars colored by their value
+        }
+        return filled;
+    });
+    Plotly.newPlot(name + "-chart", data, template.layout, {responsive: true});
+}
+"""
+
+PAGE_STYLE = """body { font-family: sans-serif; max-width: 1100px; margin: 2rem auto; color: #262730; }
+h1 { color: %s; }
+table { border-collapse: collapse; margin-bottom: 1rem; }
+th, td { border-bottom: 1px solid #ddd; padding: 0.4rem 0.8rem; text-align: left; }
+.charts { display: flex; gap: 1rem; }
+.charts div { flex: 1; min-height: 400px; }
+.muted { color: #777; }""" % BRAND_CONFIG['primary_color']
+
+# Sample session the chart templates are built from; pages swap in their own labels and scores
+TEMPLATE_SESSION = {'questions': [
+    {'score': 5, 'difficulty': 'Easy'}, {'score': 5, 'difficulty': 'Medium'}, {'score': 5, 'difficulty': 'Hard'}
+]}
+
+_worker = {}
+
+def build_chart_templates(analytics):
+    """Trace skeletons and layouts of the session charts, built once with the app's chart builders"""
+    templates = {}
+    figures = (('performance', analytics.create_performance_chart(TEMPLATE_SESSION)),
+               ('difficulty', analytics.create_difficulty_chart(TEMPLATE_SESSION)))
+    for name, figure in figures:
+        spec = json.loads(figure.to_json())
+        for trace in spec['data']:
+            trace.pop('x', None)
+            trace.pop('y', None)
+        templates[name] = spec
+    return templates
+
+def write_file(path, text):
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_file, path)
+
+def _table(headers, rows):
+    head = "".join(f"<th>{html.escape(str(h))}</th>" for h in headers)
+    body = "".join("<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + "</tr>" for row in rows)
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+def _page(title, body, charts=""):
+    scripts = f'<script src="{PLOTLY_JS_FILE}"></script><script src="{CHARTS_JS_FILE}"></script>' if charts else ""
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+            f'<style>{PAGE_STYLE}</style>{scripts}</head><body>{body}'
+            f'{f"<script>{charts}</script>" if charts else ""}</body></html>')
+
+def render_candidate_page(analytics, user_id):
+    """HTML report of a candidate's history and latest scored session, with its index row; None without scored sessions"""
+    history = analytics.get_session_history(user_id)
+    if not history:
+        return None, None
+    rollup = analytics.get_rollup(user_id)  # Running totals kept up to date as sessions are saved
+    latest = None
+    for session in reversed(analytics.load_sessions(user_id)):
+        metrics = analytics.generate_performance_metrics(session)
+        if metrics:
+            latest = session
+            break
+
+    average = rollup['score_sum'] / rollup['scored_sessions'] if rollup['scored_sessions'] else 0.0
+    body = [
+        f"<h1>{html.escape(BRAND_CONFIG['company_name'])}: {html.escape(user_id)}</h1>",
+        f'<p class="muted">Generated {datetime.now().strftime("%Y-%m-%d %H:%M")}</p>',
+        "<h2>Overview</h2>",
+        _table(['Total Sessions', 'Avg Score', 'Questions Practiced', 'Roles Explored'],
+               [[rollup['total_sessions'], f"{average:.1f}/10", rollup['answered_questions'], len(rollup['roles'])]]),
+        "<h2>Recent Sessions</h2>",
+        _table(['Date', 'Role', 'Avg Score', 'Weighted Score', 'Questions'],
+               [[h['date'], h['role'], f"{h['avg_score']:.1f}", f"{h['weighted_score']:.1f}", h['questions']] for h in reversed(history)]),
+        f"<h2>Latest Session: {html.escape(latest['role'])} ({latest['timestamp'][:10]})</h2>",
+        _table(['Average Score', 'Weighted Score', 'Highest Score', 'Questions Answered'],
+               [[f"{metrics['average_score']:.1f}/10", f"{metrics['weighted_score']:.1f}/10",
+                 f"{metrics['highest_score']}/10", f"{metrics['answered_questions']}/{metrics['total_questions']}"]])
+    ]
+    for rank in analytics.session_percentiles(latest):
+        scope = "overall" if rank['difficulty'] == 'All' else f"on {rank['difficulty']} questions"
+        body.append(f"<p>Scored better than <b>{rank['percentile']:.0f}%</b> of {html.escape(latest['role'])} "
+                    f"candidates {scope} ({rank['cohort_size']} sessions)</p>")
+
+    charts = []
+    chart_divs = []
+    labels, scores = analytics.performance_chart_data(latest)
+    charts.append(f"drawChart('performance', {json.dumps(labels)}, {json.dumps(scores)});")
+    chart_divs.append('<div id="performance-chart"></div>')
+    averages = analytics.difficulty_chart_data(latest)
+    if averages:
+        charts.append(f"drawChart('difficulty', {json.dumps(list(averages))}, {json.dumps(list(averages.values()))});")
+        chart_divs.append('<div id="difficulty-chart"></div>')
+    body.append(f'<div class="charts">{"".join(chart_divs)}</div>')
+
+    body.append("<h3>Strengths</h3><ul>" + "".join(f"<li>{html.escape(s)}</li>" for s in metrics['strengths']) + "</ul>")
+    body.append("<h3>Areas for Improvement</h3><ul>" + "".join(f"<li>{html.escape(s)}</li>" for s in metrics['improvement_areas']) + "</ul>")
+
+    row = {
+        'user_id': user_id,
+        'sessions': rollup['total_sessions'],
+        'average': average,
+        'latest': latest['timestamp'][:10],
+        'latest_role': latest['role']
+    }
+    return _page(f"Interview Report: {user_id}", "".join(body), "".join(charts)), row
+
+def _init_worker(out_dir):
+    _worker['out_dir'] = out_dir
+    _worker['analytics'] = InterviewAnalytics(read_only=True)
+
+def render_candidate(user_id):
+    """Render and write one candidate's page (in a worker process); returns its index row or None"""
+    analytics = _worker['analytics']
+    page, row = render_candidate_page(analytics, user_id)
+    # Each candidate is read once, so dropping their partition keeps worker memory flat
+    analytics.partitions.pop(user_id, None)
+    analytics.rollups.pop(user_id, None)
+    if page is None:
+        return None
+    write_file(os.path.join(_worker['out_dir'], f"{user_id}.html"), page)
+    return row
+
+def write_index(out_dir, rows):
+    rows = sorted(rows, key=lambda row: row['user_id'])
+    links = "".join(
+        f'<tr><td><a href="{html.escape(row["user_id"])}.html">{html.escape(row["user_id"])}</a></td>'
+        f'<td>{row["sessions"]}</td><td>{row["average"]:.1f}</td><td>{row["latest"]}</td>'
+        f'<td>{html.escape(row["latest_role"])}</td></tr>'
+        for row in rows
+    )
+    body = (f"<h1>{html.escape(BRAND_CONFIG['company_name'])}: Candidate Reports</h1>"
+            f'<p class="muted">{len(rows)} candidates, generated {datetime.now().strftime("%Y-%m-%d %H:%M")}</p>'
+            f"<table><tr><th>Candidate</th><th>Sessions</th><th>Avg Score</th><th>Latest Session</th><th>Role</th></tr>{links}</table>")
+    write_file(os.path.join(out_dir, INDEX_FILE), _page("Candidate Reports", body))
+
+def generate_reports(out_dir, user_ids=None, workers=None):
+    """Write one HTML report per candidate plus an index, rendering across a process pool
+
+    Pages are written as soon as each is rendered. Returns (pages written, seconds taken).
+    """
+    # Read-only: the running app owns the save spool, so saves it has not stored yet appear in the next run
+    analytics = InterviewAnalytics(read_only=True)
+    # Build any missing shared indexes here, so workers only ever read
+    analytics.get_calibration()
+    analytics.get_percentiles()
+    user_ids = [safe_user_id(user_id) for user_id in user_ids] if user_ids else analytics.stored_user_ids()
+
+    os.makedirs(out_dir, exist_ok=True)
+    import plotly.offline
+    plotly_js = os.path.join(out_dir, PLOTLY_JS_FILE)
+    if not os.path.exists(plotly_js):
+        write_file(plotly_js, plotly.offline.get_plotlyjs())
+    write_file(os.path.join(out_dir, CHARTS_JS_FILE), CHARTS_JS % json.dumps(build_chart_templates(analytics)))
+
+    rows = []
+    start = time.perf_counter()
+    # Spawned workers start clean instead of inheriting this process's threads and open databases
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(out_dir,)) as executor:
+        for done, row in enumerate(executor.map(render_candidate, user_ids, chunksize=CHUNK_SIZE), 1):
+            if row:
+                rows.append(row)
+            if done % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - start
+                print(f"  {done}/{len(user_ids)} candidates, {len(rows) / elapsed:.1f} pages/s")
+    write_index(out_dir, rows)
+    return len(rows), time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write HTML interview reports for many candidates")
+    parser.add_argument("--out", default=ANALYTICS_CONFIG['report_dir'], help="output directory")
+    parser.add_argument("--users", nargs="*", help="candidate ids (default: every stored candidate)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    pages, elapsed = generate_reports(args.out, args.users, args.workers)
+    print(f"Wrote {pages} reports to {args.out} in {elapsed:.1f} s ({pages / elapsed if elapsed else 0:.1f} pages/s)")
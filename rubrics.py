@@ -0,0 +1,245 @@
+import re
+import json
+import zlib
+from functools import lru_cache
+from answer_pipeline import AnswerFeatures
+from calibration import get_calibration_index
+from confidence import ConfidenceAnalyzer
+from question_bank import DIFFICULTIES
+from config import FEEDBACK_CONFIG
+
+# Versioned scoring rubrics.
+#
+# Every evaluation records the id of the rubric that scored it. rubrics.json is append
+# only: to change keyword points, the length bonus or the difficulty multipliers, add a
+# new version and point FEEDBACK_CONFIG['rubric'] at it. A rubric's vocabulary file is
+# pinned by a checksum, so editing it in place is caught instead of silently rescoring.
+
+RUBRICS_FILE = "rubrics.json"
+UNKNOWN_RUBRIC = 255  # Scores stored before rubrics were versioned
+SHORT_ANSWER_CHARS = 10  # Answers shorter than this get SHORT_ANSWER_SCORE under every rubric
+SHORT_ANSWER_SCORE = 2
+
+def vocabulary_crc(vocabularies):
+    """Checksum of a vocabulary's content, independent of how its file is formatted"""
+    return zlib.crc32(json.dumps(vocabularies, sort_keys=True).encode('utf-8'))
+
+class KeywordMatcher:
+    """Single compiled pattern that finds every keyword of one vocabulary in a pass"""
+    def __init__(self, keyword_scores):
+        self.keyword_scores = keyword_scores
+        # Longest terms first so multi-word phrases win over their prefixes; the
+        # lookahead keeps matches overlapping, like the old per-keyword `in` checks
+        terms = sorted(keyword_scores, key=len, reverse=True)
+        self.pattern = re.compile("(?=(" + "|".join(re.escape(t) for t in terms) + "))")
+
+    def find(self, text):
+        """Return the set of vocabulary terms present in lowercased text"""
+        return set(self.pattern.findall(text))
+
+    def score(self, text):
+        """Sum the points of every distinct term present in lowercased text"""
+        return sum(self.keyword_scores[term] for term in self.find(text))
+
+class Rubric:
+    """One rubric version: keyword points per role, length bonus and difficulty multipliers"""
+    def __init__(self, definition, vocabularies, confidence_analyzer):
+        self.id = definition['id']
+        self.description = definition.get('description', '')
+        self.vocabularies = vocabularies
+        self.length_words_per_point = definition['length_words_per_point']
+        self.max_length_bonus = definition['max_length_bonus']
+        self.difficulty_multipliers = definition['difficulty_multipliers']
+        self.confidence_analyzer = confidence_analyzer  # Shared by rubrics with the same vocabulary file
+        self._matchers = {}
+
+    def get_matcher(self, role):
+        """Get the cached keyword matcher for a role (generic terms for unknown roles)"""
+        if role not in self._matchers:
+            keyword_scores = dict(self.vocabularies['generic'])
+            keyword_scores.update(self.vocabularies['roles'].get(role, {}))
+            self._matchers[role] = KeywordMatcher(keyword_scores)
+        return self._matchers[role]
+
+    def length_bonus(self, word_count):
+        """Points for answer length"""
+        return min(word_count / self.length_words_per_point, self.max_length_bonus)
+
+    def score(self, keyword_score, length_bonus, confidence_adjustment, level):
+        """1-10 score from an answer's signals and its question's difficulty level (None: no multiplier)"""
+        score = keyword_score + length_bonus + confidence_adjustment
+        score *= self.difficulty_multipliers.get(level, 1.0)
+        return max(1, min(10, int(score + 5)))
+
+def _with_keyword_scores(vocabularies, overrides):
+    """A vocabulary with a rubric's keyword point overrides applied"""
+    if not overrides:
+        return vocabularies
+    merged = dict(vocabularies, generic=dict(vocabularies['generic']),
+                  roles={role: dict(terms) for role, terms in vocabularies['roles'].items()})
+    merged['generic'].update(overrides.get('generic', {}))
+    for role, terms in overrides.get('roles', {}).items():
+        merged['roles'].setdefault(role, {}).update(terms)
+    return merged
+
+@lru_cache(maxsize=None)
+def load_rubrics(path=RUBRICS_FILE):
+    """Load every rubric version by id (once per process)
+
+    Raises ValueError if a vocabulary file no longer matches the checksum its rubrics pinned.
+    """
+    with open(path) as f:
+        definitions = json.load(f)
+    vocabularies = {}
+    analyzers = {}
+    rubrics = {}
+    for definition in definitions:
+        name = definition['vocabulary']
+        if name not in vocabularies:
+            with open(name) as f:
+                vocabularies[name] = json.load(f)
+            analyzers[name] = ConfidenceAnalyzer(vocabularies[name])
+        if vocabulary_crc(vocabularies[name]) != definition['vocabulary_crc']:
+            raise ValueError(f"{name} changed since rubric {definition['id']} was defined; "
+                             f"add a new vocabulary file and rubric version instead of editing it")
+        rubrics[definition['id']] = Rubric(definition, _with_keyword_scores(vocabularies[name], definition.get('keyword_scores')), analyzers[name])
+    return rubrics
+
+def get_rubric(rubric_id):
+    """A rubric version by id"""
+    rubrics = load_rubrics()
+    if rubric_id not in rubrics:
+        raise ValueError(f"Unknown rubric {rubric_id}; {RUBRICS_FILE} defines {sorted(rubrics)}")
+    return rubrics[rubric_id]
+
+def collect_answers(sessions):
+    """Scored, stored answers as (answer, role, difficulty, question id) tuples"""
+    return [(q_data['answer'], session_data['role'], q_data.get('difficulty'), q_data.get('id'))
+            for session_data in sessions for q_data in session_data['questions']
+            if q_data.get('score') and q_data.get('answer')]
+
+def score_corpus(answers, rubrics):
+    """Score every answer under each rubric; returns {rubric id: uint8 score array}
+
+    Text features and calibrated difficulty levels are computed once per answer and shared
+    by all rubrics (as is confidence, between rubrics on the same vocabulary file); only
+    keyword matching runs per rubric. The arithmetic then runs on whole arrays.
+    """
+    import numpy as np
+    calibration = get_calibration_index()
+    features = [AnswerFeatures(answer) for answer, _, _, _ in answers]
+    word_counts = np.array([f.word_count for f in features], dtype=np.float64)
+    short = np.array([len(answer.strip()) < SHORT_ANSWER_CHARS for answer, _, _, _ in answers], dtype=bool)
+    levels = [calibration.difficulty_level(question_id, difficulty) if question_id else difficulty
+              for _, _, difficulty, question_id in answers]
+    level_codes = np.array([DIFFICULTIES.index(level) if level in DIFFICULTIES else len(DIFFICULTIES) for level in levels], dtype=np.intp)
+
+    adjustments = {}  # confidence analyzer -> score adjustment per answer
+    scores = {}
+    for rubric in rubrics:
+        keyword_scores = np.array([rubric.get_matcher(role).score(f.text) for f, (_, role, _, _) in zip(features, answers)], dtype=np.float64)
+        analyzer = rubric.confidence_analyzer
+        if not FEEDBACK_CONFIG['confidence_analysis']:
+            adjustments[analyzer] = np.zeros(len(answers))
+        elif analyzer not in adjustments:
+            adjustments[analyzer] = np.array([analyzer.analyze(f)['score_adjustment'] for f in features], dtype=np.float64)
+        # Unknown levels (the last code) are scored unscaled, like Rubric.score
+        multipliers = np.array([rubric.difficulty_multipliers.get(level, 1.0) for level in DIFFICULTIES] + [1.0])
+        length_bonus = np.minimum(word_counts / rubric.length_words_per_point, rubric.max_length_bonus)
+        raw = (keyword_scores + length_bonus + adjustments[analyzer]) * multipliers[level_codes]
+        rubric_scores = np.clip(np.trunc(raw + 5), 1, 10).astype(np.uint8)
+        rubric_scores[short] = SHORT_ANSWER_SCORE
+        scores[rubric.id] = rubric_scores
+    return scores
+
+def _means_by(keys, base, candidate, labels):
+    import numpy as np
+    counts = np.bincount(keys, minlength=len(labels))
+    base_sums = np.bincount(keys, weights=base, minlength=len(labels))
+    candidate_sums = np.bincount(keys, weights=candidate, minlength=len(labels))
+    return {labels[k]: {'count': int(counts[k]), 'base_mean': float(base_sums[k] / counts[k]),
+                        'candidate_mean': float(candidate_sums[k] / counts[k])}
+            for k in np.nonzero(counts)[0]}
+
+def diff_rubrics(base, candidate, sessions):
+    """Compare the score distributions two rubrics give the stored answers of some sessions"""
+    import numpy as np
+    answers = collect_answers(sessions)
+    if not answers:
+        return {'count': 0}
+    scores = score_corpus(answers, [base, candidate])
+    a = scores[base.id].astype(np.int64)
+    b = scores[candidate.id].astype(np.int64)
+    delta = b - a
+    roles = sorted({role for _, role, _, _ in answers})
+    role_codes = np.array([roles.index(role) for _, role, _, _ in answers], dtype=np.intp)
+    difficulties = DIFFICULTIES + ["Other"]
+    difficulty_codes = np.array([DIFFICULTIES.index(d) if d in DIFFICULTIES else len(DIFFICULTIES) for _, _, d, _ in answers], dtype=np.intp)
+    return {
+        'count': int(a.size),
+        'base_mean': float(a.mean()),
+        'candidate_mean': float(b.mean()),
+        'mean_delta': float(delta.mean()),
+        'changed': float(np.count_nonzero(delta) / a.size),
+        'raised': float(np.count_nonzero(delta > 0) / a.size),
+        'lowered': float(np.count_nonzero(delta < 0) / a.size),
+        'base_histogram': np.bincount(a, minlength=11).tolist(),
+        'candidate_histogram': np.bincount(b, minlength=11).tolist(),
+        # transitions[i][j]: answers scored i by the base rubric and j by the candidate
+        'transitions': np.bincount(a * 11 + b, minlength=121).reshape(11, 11).tolist(),
+        'by_role': _means_by(role_codes, a, b, roles),
+        'by_difficulty': _means_by(difficulty_codes, a, b, difficulties)
+    }
+
+def format_diff(base, candidate, diff):
+    """Plain-text rubric diff report"""
+    if not diff['count']:
+        return f"No stored answers to compare rubrics {base.id} and {candidate.id} on"
+    lines = [
+        f"Rubric {base.id} -> {candidate.id} over {diff['count']} stored answers",
+        f"  mean {diff['base_mean']:.2f} -> {diff['candidate_mean']:.2f} ({diff['mean_delta']:+.2f})",
+        f"  changed {diff['changed']:.1%} (raised {diff['raised']:.1%}, lowered {diff['lowered']:.1%})",
+        "",
+        "  score   base  candidate"
+    ]
+    for score in range(1, 11):
+        lines.append(f"  {score:>5} {diff['base_histogram'][score]:>6} {diff['candidate_histogram'][score]:>10}")
+    for title, groups in (("role", diff['by_role']), ("difficulty", diff['by_difficulty'])):
+        lines.append("")
+        lines.append(f"  by {title}:")
+        for label, group in groups.items():
+            lines.append(f"    {label:<20} {group['count']:>6}  {group['base_mean']:.2f} -> {group['candidate_mean']:.2f}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import datetime
+    parser = argparse.ArgumentParser(description="Compare how two rubric versions score the stored answers")
+    parser.add_argument("base", type=int, help="rubric id to compare against (e.g. the live one)")
+    parser.add_argument("candidate", type=int, help="rubric id to evaluate")
+    parser.add_argument("--users", nargs="*", help="candidate ids (default: every stored candidate)")
+    args = parser.parse_args()
+    from analytics import InterviewAnalytics
+    from storage import safe_user_id
+    analytics = InterviewAnalytics(read_only=True)
+    sessions = analytics.iter_all_sessions(include_answers=True)
+    if args.users:
+        wanted = {safe_user_id(user_id) for user_id in args.users}
+        sessions = (s for s in sessions if safe_user_id(s.get('user_id')) in wanted)
+    try:
+        base, candidate = get_rubric(args.base), get_rubric(args.candidate)
+    except ValueError as e:
+        parser.error(str(e))
+    print(format_diff(base, candidate, diff_rubrics(base, candidate, sessions)))
+
+    # Scores as stored, by the rubric that produced them
+    stored = analytics.score_store.mean_by('rubric')
+    if stored:
+        print("\nStored scores by rubric: " + ", ".join(f"{'unversioned' if rubric is None else rubric}: {mean:.2f}" for rubric, mean in stored.items()))
+
+    from shadow import shadow_summary
+    shadow = shadow_summary(candidate.id)
+    if shadow['count']:
+        print(f"\nShadow scoring of live answers with rubric {candidate.id}: {shadow['count']} answers since "
+              f"{datetime.fromtimestamp(shadow['since']):%Y-%m-%d}, live mean {shadow['live_mean']:.2f} -> "
+              f"shadow {shadow['shadow_mean']:.2f} ({shadow['mean_delta']:+.2f}), {shadow['changed']:.1%} changed")
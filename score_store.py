@@ -0,0 +1,242 @@
+import os
+import json
+import threading
+import numpy as np
+from datetime import datetime
+from question_bank import DIFFICULTIES
+from rubrics import UNKNOWN_RUBRIC
+
+# One row per scored question, one fixed-width file per column. Ids for strings
+# (users, roles, question ids) come from an append-only dictionary file.
+COLUMNS = {
+    'timestamp': np.float64,
+    'user_id': np.uint32,
+    'role_id': np.uint16,
+    'question_id': np.uint32,
+    'difficulty': np.uint8,
+    'score': np.uint8,
+    'seconds': np.float32,  # Time spent on the question, NaN when the session has no timing events
+    'rubric': np.uint8  # Rubric version that produced the score, UNKNOWN_RUBRIC if unrecorded
+}
+# Value of rows stored before a column was added
+COLUMN_DEFAULTS = {'seconds': np.nan, 'rubric': UNKNOWN_RUBRIC}
+DICTIONARY_KINDS = ['users', 'roles', 'questions']
+COLUMN_DICTIONARIES = {'user_id': 'users', 'role_id': 'roles', 'question_id': 'questions'}
+
+class ScoreStore:
+    """Append-only columnar store of question scores, scanned through np.memmap"""
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._columns = {}
+        self._columns_rows = -1
+        self.built = os.path.exists(self._built_file())  # False until rebuild() has loaded the stored sessions
+
+        dictionary_file = self._dictionary_file()
+        if os.path.exists(dictionary_file):
+            with open(dictionary_file, 'r') as f:
+                self.dictionary = json.load(f)
+        else:
+            self.dictionary = {kind: [] for kind in DICTIONARY_KINDS}
+        self._ids = {kind: {value: i for i, value in enumerate(values)} for kind, values in self.dictionary.items()}
+
+        # A crash mid-append can leave some columns one batch longer; rows past the shortest, or past
+        # the last completed append, are ignored and overwritten by the next append
+        existing = [name for name in COLUMNS if os.path.exists(self._column_file(name))]
+        self.rows = min(self._file_rows(name) for name in existing) if existing else 0
+        self.applied_seq = 0  # Save spool seq of the last session appended
+        if os.path.exists(self._applied_file()):
+            with open(self._applied_file(), 'r') as f:
+                applied = json.load(f)
+            self.rows = min(self.rows, applied['rows'])
+            self.applied_seq = applied['seq']
+        for name in COLUMNS:
+            if name not in existing and self.rows:
+                # Column added after rows were stored: backfill it so every column has the same length
+                with open(self._column_file(name), 'wb') as f:
+                    f.write(np.full(self.rows, COLUMN_DEFAULTS[name], dtype=COLUMNS[name]).tobytes())
+
+    def _dictionary_file(self):
+        return os.path.join(self.directory, "dictionary.json")
+
+    def _applied_file(self):
+        return os.path.join(self.directory, "applied.json")
+
+    def _built_file(self):
+        return os.path.join(self.directory, "built")
+
+    def _column_file(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def _file_rows(self, name):
+        path = self._column_file(name)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // np.dtype(COLUMNS[name]).itemsize
+
+    def _lookup_id(self, kind, value):
+        """Get the id of a string, adding it to the dictionary if new"""
+        ids = self._ids[kind]
+        if value not in ids:
+            ids[value] = len(self.dictionary[kind])
+            self.dictionary[kind].append(value)
+        return ids[value]
+
+    def append_session(self, session_data, timestamp):
+        """Append one row per scored question of a session"""
+        self.append_sessions([dict(session_data, timestamp=timestamp)])
+
+    def append_sessions(self, sessions):
+        """Append one row per scored question of each session, in a single write per column
+
+        Session timestamps may be ISO strings or epoch seconds.
+        """
+        rows = {name: [] for name in COLUMNS}
+        seq = max((session_data.get('seq', 0) for session_data in sessions), default=0)
+        with self._lock:
+            dictionary_size = sum(len(values) for values in self.dictionary.values())
+            for session_data in sessions:
+                timestamp = session_data['timestamp']
+                if isinstance(timestamp, str):
+                    timestamp = datetime.fromisoformat(timestamp).timestamp()
+                user_id = self._lookup_id('users', session_data.get('user_id') or '')
+                role_id = self._lookup_id('roles', session_data.get('role') or '')
+                for q_data in session_data['questions']:
+                    if not q_data.get('score'):
+                        continue
+                    difficulty = q_data.get('difficulty')
+                    rows['timestamp'].append(timestamp)
+                    rows['user_id'].append(user_id)
+                    rows['role_id'].append(role_id)
+                    rows['question_id'].append(self._lookup_id('questions', q_data.get('id') or ''))
+                    rows['difficulty'].append(DIFFICULTIES.index(difficulty) if difficulty in DIFFICULTIES else 255)
+                    rows['score'].append(q_data['score'])
+                    seconds = q_data.get('seconds')
+                    rows['seconds'].append(np.nan if seconds is None else seconds)
+                    rubric = (q_data.get('evaluation') or {}).get('rubric')
+                    rows['rubric'].append(UNKNOWN_RUBRIC if rubric is None else rubric)
+
+            if not rows['score'] and seq <= self.applied_seq:
+                return
+            # New strings are written before any row refers to them
+            if sum(len(values) for values in self.dictionary.values()) != dictionary_size:
+                with open(self._dictionary_file(), 'w') as f:
+                    json.dump(self.dictionary, f)
+            for name, dtype in COLUMNS.items():
+                with open(self._column_file(name), 'r+b' if os.path.exists(self._column_file(name)) else 'wb') as f:
+                    f.seek(self.rows * np.dtype(dtype).itemsize)
+                    f.write(np.asarray(rows[name], dtype=dtype).tobytes())
+                    f.truncate()
+            # Rows count once the marker names them; a crash before this leaves them to be overwritten
+            applied = {'seq': max(self.applied_seq, seq), 'rows': self.rows + len(rows['score'])}
+            tmp_file = self._applied_file() + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(applied, f)
+            os.replace(tmp_file, self._applied_file())
+            self.rows = applied['rows']
+            self.applied_seq = applied['seq']
+
+    def rebuild(self, sessions):
+        """Replace every row with the scored questions of a stream of sessions, then mark the store built"""
+        with self._lock:
+            for marker in (self._built_file(), self._applied_file()):
+                if os.path.exists(marker):
+                    os.remove(marker)
+            self.dictionary = {kind: [] for kind in DICTIONARY_KINDS}
+            self._ids = {kind: {} for kind in DICTIONARY_KINDS}
+            with open(self._dictionary_file(), 'w') as f:
+                json.dump(self.dictionary, f)
+            for name in COLUMNS:
+                open(self._column_file(name), 'wb').close()
+            self.rows = 0
+            self.applied_seq = 0
+            self._columns = {}
+            self._columns_rows = -1
+        batch = []
+        for session_data in sessions:
+            batch.append(session_data)
+            if len(batch) >= 500:
+                self.append_sessions(batch)
+                batch = []
+        self.append_sessions(batch)
+        open(self._built_file(), 'w').close()
+        self.built = True
+
+    def columns(self):
+        """Memory-mapped views of every column, re-mapped only after appends"""
+        with self._lock:
+            if self._columns_rows != self.rows:
+                self._columns = {
+                    name: np.memmap(self._column_file(name), dtype=dtype, mode='r', shape=(self.rows,))
+                    if self.rows else np.empty(0, dtype=dtype)
+                    for name, dtype in COLUMNS.items()
+                }
+                self._columns_rows = self.rows
+            return self._columns
+
+    def mask(self, user_id=None, role=None, difficulty=None, question_id=None, since=None, until=None, rubric=None):
+        """Boolean row mask for the given filters (timestamps are epoch seconds)"""
+        columns = self.columns()
+        mask = np.ones(self.rows, dtype=bool)
+        for kind, column, value in (('users', 'user_id', user_id), ('roles', 'role_id', role), ('questions', 'question_id', question_id)):
+            if value is not None:
+                if value not in self._ids[kind]:
+                    return np.zeros(self.rows, dtype=bool)
+                mask &= columns[column] == self._ids[kind][value]
+        if difficulty is not None:
+            mask &= columns['difficulty'] == DIFFICULTIES.index(difficulty)
+        if rubric is not None:
+            mask &= columns['rubric'] == rubric
+        if since is not None:
+            mask &= columns['timestamp'] >= since
+        if until is not None:
+            mask &= columns['timestamp'] < until
+        return mask
+
+    def scores(self, **filters):
+        """Scores of every row matching the filters"""
+        return self.columns()['score'][self.mask(**filters)]
+
+    def summary(self, **filters):
+        """Count, mean and score histogram (index = score) of the matching rows"""
+        scores = self.scores(**filters)
+        return {
+            'count': int(scores.size),
+            'mean': float(scores.mean()) if scores.size else 0.0,
+            'histogram': np.bincount(scores, minlength=11).tolist()
+        }
+
+    def _label(self, column, key):
+        if column in COLUMN_DICTIONARIES:
+            return self.dictionary[COLUMN_DICTIONARIES[column]][key]
+        if column == 'difficulty':
+            return DIFFICULTIES[key] if key < len(DIFFICULTIES) else None
+        if column == 'rubric':
+            return None if key == UNKNOWN_RUBRIC else key
+        return key
+
+    def timing(self, **filters):
+        """Count, mean, median and 90th percentile of seconds per question over timed matching rows"""
+        seconds = self.columns()['seconds'][self.mask(**filters)]
+        seconds = seconds[~np.isnan(seconds)].astype(np.float64)
+        if not seconds.size:
+            return {'count': 0, 'mean': 0.0, 'median': 0.0, 'p90': 0.0}
+        median, p90 = np.percentile(seconds, [50, 90])
+        return {'count': int(seconds.size), 'mean': float(seconds.mean()), 'median': float(median), 'p90': float(p90)}
+
+    def mean_by(self, column, value='score', **filters):
+        """Mean score (or other value column) per distinct value of a column (e.g. 'difficulty', 'role_id')
+
+        Rows whose value is NaN (e.g. untimed questions) are left out.
+        """
+        columns = self.columns()
+        mask = self.mask(**filters)
+        if value != 'score':
+            mask &= ~np.isnan(columns[value])
+        keys = columns[column][mask].astype(np.int64)
+        values = columns[value][mask].astype(np.float64)
+        counts = np.bincount(keys)
+        sums = np.bincount(keys, weights=values)
+        present = np.nonzero(counts)[0]
+        return {self._label(column, int(key)): float(sums[key] / counts[key]) for key in present}
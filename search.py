@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from config import STORAGE_CONFIG
+
+SEARCH_INDEX_FILE = "search_index.sqlite"
+PAGE_SIZE = 10
+
+class SearchIndex:
+    """Full-text index (SQLite FTS5) of stored questions and answers, filterable by role, difficulty and score
+
+    Queries use FTS5 syntax: words are ANDed, and OR, NOT, "exact phrases" and prefix* work.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                user_id TEXT,
+                role TEXT,
+                difficulty TEXT,
+                score INTEGER,
+                session_id INTEGER,
+                timestamp TEXT,
+                question_id TEXT
+            );
+            CREATE INDEX IF NOT EXISTS entries_user ON entries (user_id, role, difficulty, score);
+            CREATE VIRTUAL TABLE IF NOT EXISTS entries_text USING fts5(question, answer, tokenize='porter unicode61');
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        # Connecting creates the file, so only the marker written by a finished rebuild() proves it was backfilled
+        self.is_new = self._db.execute("SELECT 1 FROM meta WHERE key = 'built'").fetchone() is None
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'applied_seq'").fetchone()
+        self.applied_seq = int(row[0]) if row else 0  # Save spool seq of the last session added
+
+    def add_sessions(self, sessions):
+        """Index every answered question of newly stored sessions, in one transaction"""
+        seq = max((session_data.get('seq', 0) for session_data in sessions), default=0)
+        with self._lock, self._db:
+            for session_data in sessions:
+                for q_data in session_data['questions']:
+                    if not (q_data.get('answer') or '').strip():
+                        continue
+                    cursor = self._db.execute(
+                        "INSERT INTO entries (user_id, role, difficulty, score, session_id, timestamp, question_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (session_data.get('user_id'), session_data.get('role'), q_data.get('difficulty'), q_data.get('score'),
+                         session_data.get('session_id'), session_data.get('timestamp'), q_data.get('id'))
+                    )
+                    self._db.execute(
+                        "INSERT INTO entries_text (rowid, question, answer) VALUES (?, ?, ?)",
+                        (cursor.lastrowid, q_data.get('question') or '', q_data['answer'])
+                    )
+            if seq > self.applied_seq:
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('applied_seq', ?)", (seq,))
+        self.applied_seq = max(self.applied_seq, seq)
+
+    def rebuild(self, sessions):
+        """Re-index every answer from a stream of sessions (with answer text)"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM meta")
+            self._db.execute("DELETE FROM entries_text")
+            self._db.execute("DELETE FROM entries")
+        self.applied_seq = 0
+        batch = []
+        for session_data in sessions:
+            batch.append(session_data)
+            if len(batch) >= 500:
+                self.add_sessions(batch)
+                batch = []
+        self.add_sessions(batch)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', datetime('now'))")
+        self.is_new = False
+
+    def search(self, query, user_id=None, role=None, difficulty=None, min_score=None, max_score=None, page=0, page_size=PAGE_SIZE):
+        """One page of matches, best first, with the total match count
+
+        Raises ValueError for queries FTS5 cannot parse.
+        """
+        conditions = ["entries_text MATCH ?"]
+        params = [query]
+        for column, value in (('e.user_id', user_id), ('e.role', role), ('e.difficulty', difficulty)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if min_score is not None:
+            conditions.append("e.score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            conditions.append("e.score <= ?")
+            params.append(max_score)
+        where = " AND ".join(conditions)
+
+        # CROSS JOIN keeps the full-text match as the driving table; filters are checked by rowid lookups
+        try:
+            with self._lock:
+                (total,) = self._db.execute(
+                    f"SELECT COUNT(*) FROM entries_text CROSS JOIN entries e ON e.id = entries_text.rowid WHERE {where}", params
+                ).fetchone()
+                rows = self._db.execute(
+                    f"""SELECT e.role, e.difficulty, e.score, e.session_id, e.timestamp, e.question_id, entries_text.question,
+                               snippet(entries_text, 1, '**', '**', ' … ', 24)
+                        FROM entries_text CROSS JOIN entries e ON e.id = entries_text.rowid
+                        WHERE {where} ORDER BY entries_text.rank LIMIT ? OFFSET ?""",
+                    params + [page_size, page * page_size]
+                ).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query: {e}")
+
+        columns = ['role', 'difficulty', 'score', 'session_id', 'timestamp', 'question_id', 'question', 'snippet']
+        return {'total': total, 'page': page, 'page_size': page_size, 'results': [dict(zip(columns, row)) for row in rows]}
+
+@lru_cache(maxsize=None)
+def get_search_index(path=None):
+    """Shared search index (once per process)"""
+    os.makedirs(STORAGE_CONFIG['data_dir'], exist_ok=True)
+    return SearchIndex(path or os.path.join(STORAGE_CONFIG['data_dir'], SEARCH_INDEX_FILE))
@@ -0,0 +1,382 @@
+import os
+import sys
+import zlib
+import json
+import struct
+import threading
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from config import STORAGE_CONFIG
+from question_bank import load_question_bank, DIFFICULTIES
+from event_log import time_on_questions
+from follow_ups import load_follow_up_index
+from rubrics import UNKNOWN_RUBRIC
+
+# Compact binary session records.
+#
+# A sessions file is a sequence of [u32 length][record] frames, so saving a session
+# is an append. Questions are stored by id (text only when the id is not in the bank), and
+# the text of every id stored is kept in an append-only table, so records still decode after
+# the bank drops or rewords a question. Evaluations are stored as style/template ids that
+# interview_bot re-renders on demand, and answers as raw deflate streams primed with a preset
+# dictionary of interview vocabulary.
+# Version 2 records end with the interview's timing events; from version 3 a question can
+# carry the follow-up turns answered under it, each stored by follow-up template index.
+# Version 4 evaluations record the id of the rubric that scored them. Version 5 records end
+# with the save spool sequence number that stored the session (0 when saved outside the spool).
+# Version 6 evaluations also record the raw score, before the difficulty multiplier.
+
+FORMAT_VERSION = 6
+ANSWER_DICTIONARY_FILES = {
+    1: "answer_dictionary_v1.txt"
+}
+CURRENT_DICTIONARY = 1
+
+# Code tables; append only, existing positions are part of the file format
+STYLES = ['encouraging', 'analytical', 'mentor', 'casual']
+FEEDBACK_TYPES = ['excellent', 'good', 'average', 'poor']
+NONE_CODE = 255
+REMOVED_QUESTION = "(question no longer in the question bank)"
+QUESTION_TEXT_FILE = "question_texts.jsonl"
+
+# Per-question flags
+INLINE_TEXT = 1  # Question text stored because its id is not in the bank
+HAS_EVALUATION = 2
+LEGACY_FEEDBACK = 4  # Rendered feedback from sessions saved before evaluations were structured
+HAS_FOLLOW_UPS = 8
+
+FRAME = struct.Struct('<I')
+HEADER = struct.Struct('<BdI')  # version, timestamp, session id
+SCORE = struct.Struct('<BBB')  # flags, difficulty code, score
+EVALUATION = struct.Struct('<BBBBBB')  # style, feedback type, template, follow-up, rubric, raw score
+EVALUATION_V5 = struct.Struct('<BBBBB')  # Before raw scores were recorded
+EVALUATION_V3 = struct.Struct('<BBBB')  # Before rubrics were versioned
+TURN = struct.Struct('<BB')  # follow-up index, score (0 when not evaluated)
+EVENT = struct.Struct('<fBB')  # seconds since the interview started, kind, question index
+SEQ = struct.Struct('<Q')  # save spool sequence number
+
+_dictionaries = {}
+
+class QuestionTextTable:
+    """Append-only id -> text table of the questions sessions are stored by
+
+    Created from the whole bank, so sessions stored before the table existed are covered too.
+    A question's line is fsynced before any record that refers to it is written.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.texts = {}
+        if not os.path.exists(path):
+            tmp_file = path + ".tmp"
+            with open(tmp_file, 'w') as f:
+                for question_id, record in load_question_bank().by_id.items():
+                    f.write(json.dumps([question_id, record['question']]) + "\n")
+            os.replace(tmp_file, path)
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    question_id, text = json.loads(line)
+                except ValueError:
+                    break  # Torn final write; no record refers to that question yet
+                self.texts[question_id] = text
+
+    def get(self, question_id, default=None):
+        return self.texts.get(question_id, default)
+
+    def add(self, question_id, text):
+        """Record a question's text unless its id is already known"""
+        if question_id in self.texts:
+            return
+        with self._lock:
+            if question_id not in self.texts:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps([question_id, text]) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.texts[question_id] = text
+
+@lru_cache(maxsize=None)
+def get_question_texts(path=None):
+    """Shared question text table (once per process)"""
+    os.makedirs(STORAGE_CONFIG['data_dir'], exist_ok=True)
+    return QuestionTextTable(path or os.path.join(STORAGE_CONFIG['data_dir'], QUESTION_TEXT_FILE))
+
+def _get_dictionary(dictionary_id):
+    if dictionary_id not in _dictionaries:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ANSWER_DICTIONARY_FILES[dictionary_id])
+        with open(path, 'rb') as f:
+            _dictionaries[dictionary_id] = f.read()
+    return _dictionaries[dictionary_id]
+
+def compress_text(text):
+    """Compress text with the current preset dictionary (raw deflate, no header)"""
+    if not text:
+        return bytes([0])
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=_get_dictionary(CURRENT_DICTIONARY))
+    data = compressor.compress(text.encode('utf-8')) + compressor.flush()
+    return bytes([CURRENT_DICTIONARY]) + FRAME.pack(len(data)) + data
+
+def _read_text(buffer, offset, decompress=True):
+    dictionary_id = buffer[offset]
+    offset += 1
+    if not dictionary_id:
+        return "", offset
+    (length,) = FRAME.unpack_from(buffer, offset)
+    offset += FRAME.size
+    if not decompress:
+        return None, offset + length
+    decompressor = zlib.decompressobj(-15, zdict=_get_dictionary(dictionary_id))
+    data = decompressor.decompress(buffer[offset:offset + length]) + decompressor.flush()
+    return data.decode('utf-8'), offset + length
+
+def _pack_string(value):
+    data = (value or '').encode('utf-8')
+    return struct.pack('<H', len(data)) + data
+
+def _read_string(buffer, offset):
+    (length,) = struct.unpack_from('<H', buffer, offset)
+    offset += 2
+    return bytes(buffer[offset:offset + length]).decode('utf-8'), offset + length
+
+def _code(table, value):
+    return table.index(value) if value in table else NONE_CODE
+
+def _pack_evaluation(evaluation):
+    follow_up = evaluation.get('follow_up')
+    rubric = evaluation.get('rubric')
+    return EVALUATION.pack(
+        _code(STYLES, evaluation['style']),
+        _code(FEEDBACK_TYPES, evaluation['feedback_type']),
+        evaluation['template'],
+        NONE_CODE if follow_up is None else follow_up,
+        UNKNOWN_RUBRIC if rubric is None else rubric,
+        evaluation.get('raw_score') or 0
+    )
+
+def _read_evaluation(buffer, offset, version, score, difficulty, role):
+    if version >= 6:
+        style, feedback_type, template, follow_up, rubric, raw_score = EVALUATION.unpack_from(buffer, offset)
+        offset += EVALUATION.size
+    elif version >= 4:
+        style, feedback_type, template, follow_up, rubric = EVALUATION_V5.unpack_from(buffer, offset)
+        offset += EVALUATION_V5.size
+        raw_score = 0
+    else:
+        style, feedback_type, template, follow_up = EVALUATION_V3.unpack_from(buffer, offset)
+        offset += EVALUATION_V3.size
+        rubric = UNKNOWN_RUBRIC
+        raw_score = 0
+    return {
+        'score': score,
+        'feedback_type': FEEDBACK_TYPES[feedback_type],
+        'style': STYLES[style],
+        'template': template,
+        'follow_up': None if follow_up == NONE_CODE else follow_up,
+        'difficulty': difficulty,
+        'role': role,
+        'rubric': None if rubric == UNKNOWN_RUBRIC else rubric,
+        'raw_score': raw_score or None
+    }, offset
+
+def encode_session(session_data):
+    """Encode a session dict into a compact binary record"""
+    bank = load_question_bank()
+    timestamp = datetime.fromisoformat(session_data['timestamp']).timestamp()
+    parts = [
+        HEADER.pack(FORMAT_VERSION, timestamp, session_data.get('session_id', 0)),
+        _pack_string(session_data.get('user_id')),
+        _pack_string(session_data.get('role')),
+        _pack_string(session_data.get('difficulty')),
+        struct.pack('<H', len(session_data['questions']))
+    ]
+
+    for q_data in session_data['questions']:
+        question_id = q_data.get('id') or ''
+        evaluation = q_data.get('evaluation')
+        flags = 0
+        record = bank.get(question_id)
+        if record is None:
+            flags |= INLINE_TEXT
+        else:
+            get_question_texts().add(question_id, record['question'])
+        if evaluation:
+            flags |= HAS_EVALUATION
+        elif q_data.get('feedback'):
+            flags |= LEGACY_FEEDBACK
+        follow_ups = [turn for turn in q_data.get('follow_ups') or () if turn.get('answer')]
+        if follow_ups:
+            flags |= HAS_FOLLOW_UPS
+
+        parts.append(SCORE.pack(flags, _code(DIFFICULTIES, q_data.get('difficulty')), q_data.get('score') or 0))
+        parts.append(_pack_string(question_id))
+        if flags & INLINE_TEXT:
+            parts.append(_pack_string(q_data.get('question')))
+        if flags & HAS_EVALUATION:
+            parts.append(_pack_evaluation(evaluation))
+        parts.append(compress_text(q_data.get('answer')))
+        if flags & LEGACY_FEEDBACK:
+            parts.append(compress_text(q_data['feedback']))
+        if flags & HAS_FOLLOW_UPS:
+            parts.append(bytes([len(follow_ups)]))
+            for turn in follow_ups:
+                turn_evaluation = turn.get('evaluation')
+                parts.append(TURN.pack(turn['follow_up'], turn_evaluation['score'] if turn_evaluation else 0))
+                if turn_evaluation:
+                    parts.append(_pack_evaluation(turn_evaluation))
+                parts.append(compress_text(turn['answer']))
+
+    events = session_data.get('events') or []
+    parts.append(struct.pack('<H', len(events)))
+    parts.extend(EVENT.pack(*event) for event in events)
+    parts.append(SEQ.pack(session_data.get('seq', 0)))
+    return b''.join(parts)
+
+def decode_session(record, include_answers=True):
+    """Decode a binary record back into a session dict (feedback is re-rendered on demand)
+    
+    Answers are only decompressed with include_answers; otherwise they are left as None.
+    """
+    bank = load_question_bank()
+    follow_up_index = load_follow_up_index()
+    buffer = memoryview(record)
+    version, timestamp, session_id = HEADER.unpack_from(buffer, 0)
+    offset = HEADER.size
+    user_id, offset = _read_string(buffer, offset)
+    role, offset = _read_string(buffer, offset)
+    session_difficulty, offset = _read_string(buffer, offset)
+    (n_questions,) = struct.unpack_from('<H', buffer, offset)
+    offset += 2
+
+    questions = []
+    for _ in range(n_questions):
+        flags, difficulty_code, score = SCORE.unpack_from(buffer, offset)
+        offset += SCORE.size
+        question_id, offset = _read_string(buffer, offset)
+        difficulty = DIFFICULTIES[difficulty_code] if difficulty_code != NONE_CODE else None
+        q_data = {'id': question_id or None, 'difficulty': difficulty, 'score': score or None}
+
+        if flags & INLINE_TEXT:
+            q_data['question'], offset = _read_string(buffer, offset)
+        else:
+            record = bank.get(question_id)
+            q_data['question'] = record['question'] if record else get_question_texts().get(question_id, REMOVED_QUESTION)
+        if flags & HAS_EVALUATION:
+            q_data['evaluation'], offset = _read_evaluation(buffer, offset, version, score, difficulty, role)
+        q_data['answer'], offset = _read_text(buffer, offset, include_answers)
+        if flags & LEGACY_FEEDBACK:
+            q_data['feedback'], offset = _read_text(buffer, offset)
+        if flags & HAS_FOLLOW_UPS:
+            n_turns = buffer[offset]
+            offset += 1
+            q_data['follow_ups'] = []
+            for _ in range(n_turns):
+                follow_up, turn_score = TURN.unpack_from(buffer, offset)
+                offset += TURN.size
+                turn = {'follow_up': follow_up, 'question': follow_up_index.text(role, follow_up),
+                        'evaluation': None, 'score': turn_score or None}
+                if turn_score:
+                    turn['evaluation'], offset = _read_evaluation(buffer, offset, version, turn_score, difficulty, role)
+                turn['answer'], offset = _read_text(buffer, offset, include_answers)
+                q_data['follow_ups'].append(turn)
+        questions.append(q_data)
+
+    session_data = {
+        'user_id': user_id,
+        'role': role,
+        'difficulty': session_difficulty,
+        'questions': questions,
+        'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+        'session_id': session_id
+    }
+    if version >= 2:
+        (n_events,) = struct.unpack_from('<H', buffer, offset)
+        offset += 2
+        events = [list(EVENT.unpack_from(buffer, offset + i * EVENT.size)) for i in range(n_events)]
+        offset += n_events * EVENT.size
+        if events:
+            session_data['events'] = events
+            for q_data, seconds in zip(questions, time_on_questions(events, len(questions))):
+                q_data['seconds'] = seconds
+    if version >= 5:
+        (session_data['seq'],) = SEQ.unpack_from(buffer, offset)
+    return session_data
+
+def append_sessions(path, sessions):
+    """Append sessions to a binary sessions file; on error nothing is left appended"""
+    with open(path, 'ab') as f:
+        start = f.tell()
+        try:
+            for session_data in sessions:
+                record = encode_session(session_data)
+                f.write(FRAME.pack(len(record)) + record)
+            # Sessions are the source of truth behind the save spool's checkpoint
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.truncate(start)
+            raise
+
+def iter_sessions(path, include_answers=True):
+    """Stream sessions from a binary sessions file one frame at a time"""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(FRAME.size)
+            if len(header) < FRAME.size:
+                return
+            (length,) = FRAME.unpack(header)
+            record = f.read(length)
+            if len(record) < length:
+                return  # Torn final write; everything before it is intact
+            yield decode_session(record, include_answers)
+
+def read_sessions(path, include_answers=True):
+    """Read every session from a binary sessions file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    sessions = []
+    offset = 0
+    while offset + FRAME.size <= len(data):
+        (length,) = FRAME.unpack_from(data, offset)
+        offset += FRAME.size
+        if offset + length > len(data):
+            break  # Torn final write; everything before it is intact
+        sessions.append(decode_session(data[offset:offset + length], include_answers))
+        offset += length
+    return sessions
+
+def train_answer_dictionary(texts, size=16 * 1024):
+    """Build a preset compression dictionary from the most useful 1-3 word phrases in sample texts"""
+    phrases = Counter()
+    for text in texts:
+        words = text.lower().split()
+        for n in (1, 2, 3):
+            for i in range(len(words) - n + 1):
+                phrases[' '.join(words[i:i + n])] += 1
+
+    # deflate favours recent dictionary bytes, so the most valuable phrases go last
+    ranked = sorted((p for p, count in phrases.items() if count > 1), key=lambda p: phrases[p] * len(p), reverse=True)
+    chosen = []
+    total = 0
+    for phrase in ranked:
+        if total + len(phrase) + 1 > size:
+            break
+        chosen.append(phrase)
+        total += len(phrase) + 1
+    return ' '.join(reversed(chosen)).encode('utf-8')
+
+if __name__ == "__main__":
+    # Usage: python session_codec.py <output file> [data dir]
+    # Trains a new answer dictionary from every stored answer. Register the output as the
+    # next entry of ANSWER_DICTIONARY_FILES and bump CURRENT_DICTIONARY; never edit old ones.
+    data_dir = sys.argv[2] if len(sys.argv) > 2 else "data"
+    answers = []
+    users_dir = os.path.join(data_dir, "users")
+    for user in sorted(os.listdir(users_dir)) if os.path.isdir(users_dir) else []:
+        path = os.path.join(users_dir, user, "sessions.bin")
+        if os.path.exists(path):
+            answers.extend(q['answer'] for s in read_sessions(path) for q in s['questions'] if q['answer'])
+    with open(sys.argv[1], 'wb') as f:
+        f.write(train_answer_dictionary(answers))
+    print(f"Trained dictionary from {len(answers)} answers")
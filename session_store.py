@@ -0,0 +1,122 @@
+import sys
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from event_log import EventLog, SHOWN, TIME_UP
+
+class InterviewState:
+    """Compact state of one interview: question ids, answers, structured evaluations, follow-up threads and timing"""
+    __slots__ = ('user_id', 'role', 'difficulty', 'style', 'question_ids', 'answers',
+                 'evaluations', 'threads', 'current_q', 'started', 'last_active', 'saved', 'events',
+                 'seconds', 'time_up', 'shown_q', 'shown_at')
+
+    def __init__(self, user_id, role, difficulty, style, question_ids):
+        self.user_id = user_id
+        self.role = role
+        self.difficulty = difficulty
+        self.style = style
+        self.question_ids = list(question_ids)
+        self.answers = [""] * len(self.question_ids)
+        self.evaluations = [None] * len(self.question_ids)
+        self.threads = [None] * len(self.question_ids)  # FollowUpThread once a question is evaluated
+        self.current_q = 0
+        self.started = time.time()
+        self.last_active = self.started
+        self.saved = False
+        self.events = EventLog()  # Detailed trail only; it overwrites old events, so timing is kept below
+        self.seconds = [None] * len(self.question_ids)  # Time on each question, up to when it was last left
+        self.time_up = set()  # Questions whose time limit ran out
+        self.shown_q = None  # Question on screen and when it was shown, on the event log's clock
+        self.shown_at = 0.0
+
+    @property
+    def scores(self):
+        """Score of each question, None where not evaluated"""
+        return [evaluation['score'] if evaluation else None for evaluation in self.evaluations]
+
+    def show(self, question):
+        """Start timing a question unless it is already on screen"""
+        if question == self.shown_q:
+            return
+        self.leave()
+        self.shown_q, self.shown_at = question, self.events.elapsed()
+        self.events.record(SHOWN, question)
+
+    def leave(self):
+        """Stop timing the question on screen, adding its time to that question's total"""
+        if self.shown_q is not None:
+            self.seconds[self.shown_q] = (self.seconds[self.shown_q] or 0.0) + self.events.elapsed() - self.shown_at
+            self.shown_q = None
+
+    def question_seconds(self):
+        """Seconds spent on each question so far (None for questions not yet shown)"""
+        seconds = list(self.seconds)
+        if self.shown_q is not None:
+            seconds[self.shown_q] = (seconds[self.shown_q] or 0.0) + self.events.elapsed() - self.shown_at
+        return seconds
+
+    def mark_time_up(self, question):
+        """Record that a question's time limit ran out (once)"""
+        if question not in self.time_up:
+            self.time_up.add(question)
+            self.events.record(TIME_UP, question)
+
+    def footprint(self):
+        """Approximate bytes held by this state (strings shared with the question bank excluded)"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.question_ids)
+        size += sys.getsizeof(self.answers) + sum(sys.getsizeof(answer) for answer in self.answers)
+        size += sys.getsizeof(self.evaluations)
+        size += sum(sys.getsizeof(evaluation) for evaluation in self.evaluations if evaluation)
+        size += sys.getsizeof(self.threads) + sum(thread.footprint() for thread in self.threads if thread)
+        size += self.events.footprint() + sys.getsizeof(self.seconds) + sys.getsizeof(self.time_up)
+        return size
+
+class SessionStore:
+    """Server-side interview states keyed by a per-browser token, evicted after idle_timeout seconds"""
+    def __init__(self, idle_timeout):
+        self.idle_timeout = idle_timeout
+        self._states = OrderedDict()  # Least recently active first
+        self._lock = threading.Lock()
+
+    def _evict_idle(self, now):
+        while self._states:
+            token, state = next(iter(self._states.items()))
+            if now - state.last_active < self.idle_timeout:
+                break
+            del self._states[token]
+
+    def create(self, user_id, role, difficulty, style, question_ids):
+        """Start a new interview; returns its token"""
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._evict_idle(time.time())
+            self._states[token] = InterviewState(user_id, role, difficulty, style, question_ids)
+        return token
+
+    def get(self, token):
+        """Get an interview's state and mark it active, or None if unknown or evicted"""
+        now = time.time()
+        with self._lock:
+            self._evict_idle(now)
+            state = self._states.get(token)
+            if state is not None:
+                state.last_active = now
+                self._states.move_to_end(token)
+            return state
+
+    def discard(self, token):
+        """Drop an interview's state"""
+        with self._lock:
+            self._states.pop(token, None)
+
+    def stats(self):
+        """Number of live interviews and their memory footprint"""
+        with self._lock:
+            self._evict_idle(time.time())
+            sizes = [state.footprint() for state in self._states.values()]
+        return {
+            'sessions': len(sizes),
+            'total_bytes': sum(sizes),
+            'bytes_per_session': sum(sizes) / len(sizes) if sizes else 0
+        }
@@ -0,0 +1,105 @@
+import os
+import time
+import queue
+import threading
+from config import STORAGE_CONFIG
+from question_bank import DIFFICULTIES
+from rubrics import UNKNOWN_RUBRIC
+
+SHADOW_QUEUE_SIZE = 1000  # Answers waiting to be shadow scored; beyond this they are dropped, never waited on
+SHADOW_BATCH_SIZE = 50  # Rows appended to the log per write
+# One fixed-width row per shadow-scored answer, read back whole as a numpy structured array
+SHADOW_FIELDS = [('timestamp', '<f8'), ('difficulty', 'u1'), ('live_rubric', 'u1'), ('live_score', 'u1'), ('shadow_score', 'u1')]
+
+def shadow_log_file(rubric_id):
+    """Log of the scores a candidate rubric gave live answers"""
+    return os.path.join(STORAGE_CONFIG['data_dir'], "shadow", f"rubric_{rubric_id}.bin")
+
+class ShadowScorer:
+    """Scores live answers with a candidate rubric on a background thread, off the request path
+
+    submit() never blocks and never raises: answers arriving while the queue is full are
+    dropped and counted, and scoring errors are kept in last_error. Users only ever see the
+    live rubric's scores.
+    """
+    def __init__(self, rubric_id, score):
+        self.rubric_id = rubric_id
+        self.score = score  # score(answer, difficulty, role, question_id) -> candidate rubric score
+        self.path = shadow_log_file(rubric_id)
+        self.dropped = 0
+        self.scored = 0
+        self.last_error = None
+        self._queue = queue.Queue(SHADOW_QUEUE_SIZE)
+        self._worker = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._worker.start()
+
+    def submit(self, answer, difficulty, role, question_id, evaluation):
+        """Queue a live answer and its evaluation for shadow scoring"""
+        live_rubric = evaluation.get('rubric')
+        try:
+            self._queue.put_nowait((time.time(), answer, difficulty, role, question_id,
+                                    UNKNOWN_RUBRIC if live_rubric is None else live_rubric, evaluation['score']))
+        except queue.Full:
+            self.dropped += 1
+
+    def join(self):
+        """Block until every answer submitted so far has been shadow scored"""
+        self._queue.join()
+
+    def _run(self):
+        import numpy as np
+        dtype = np.dtype(SHADOW_FIELDS)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < SHADOW_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = []
+            for timestamp, answer, difficulty, role, question_id, live_rubric, live_score in batch:
+                try:
+                    shadow_score = self.score(answer, difficulty, role, question_id)
+                except Exception as e:
+                    self.last_error = e
+                    continue
+                difficulty_code = DIFFICULTIES.index(difficulty) if difficulty in DIFFICULTIES else 255
+                rows.append((timestamp, difficulty_code, live_rubric, live_score, shadow_score))
+            try:
+                if rows:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    with open(self.path, 'ab') as f:
+                        f.write(np.array(rows, dtype=dtype).tobytes())
+                    self.scored += len(rows)
+            except OSError as e:
+                self.last_error = e
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+def shadow_summary(rubric_id):
+    """Live vs. shadow score distributions of the answers a candidate rubric shadow scored"""
+    import numpy as np
+    path = shadow_log_file(rubric_id)
+    dtype = np.dtype(SHADOW_FIELDS)
+    if not os.path.exists(path):
+        return {'count': 0}
+    # A torn final write leaves a partial row; it is ignored
+    rows = np.fromfile(path, dtype=dtype, count=os.path.getsize(path) // dtype.itemsize)
+    if not rows.size:
+        return {'count': 0}
+    live = rows['live_score'].astype(np.int64)
+    shadow = rows['shadow_score'].astype(np.int64)
+    delta = shadow - live
+    return {
+        'count': int(rows.size),
+        'since': float(rows['timestamp'].min()),
+        'live_rubrics': sorted(int(r) for r in np.unique(rows['live_rubric'])),
+        'live_mean': float(live.mean()),
+        'shadow_mean': float(shadow.mean()),
+        'mean_delta': float(delta.mean()),
+        'changed': float(np.count_nonzero(delta) / rows.size),
+        'live_histogram': np.bincount(live, minlength=11).tolist(),
+        'shadow_histogram': np.bincount(shadow, minlength=11).tolist()
+    }
@@ -0,0 +1,22 @@
+import os
+import re
+import json
+from config import STORAGE_CONFIG
+
+def safe_user_id(user_id):
+    """Normalize a user id into something safe to use as a directory name"""
+    cleaned = re.sub(r'[^A-Za-z0-9_.-]', '_', (user_id or '').strip()).strip('.')
+    return cleaned or STORAGE_CONFIG['default_user']
+
+def user_dir(user_id):
+    """Get (and create) the storage directory for a user's partition"""
+    path = os.path.join(STORAGE_CONFIG['data_dir'], 'users', safe_user_id(user_id))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def write_json(path, data):
+    """Replace a JSON file in one step, so a crash never leaves it half written"""
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_file, path)
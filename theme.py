@@ -0,0 +1,178 @@
+import os
+import hashlib
+from config import BRAND_CONFIG
+
+# Theme stylesheet, generated from BRAND_CONFIG and served by Streamlit's static file
+# serving (see .streamlit/config.toml) so browsers cache it instead of every rerun
+# re-sending an inline <style> block.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+THEME_CSS_FILE = "theme.css"
+
+def build_theme_css(brand):
+    """Build the app's CSS with the brand colors filled in"""
+    return f""".main-header {{ 
+    font-size: 3rem; 
+    font-weight: bold; 
+    text-align: center; 
+    color: {brand["primary_color"]}; 
+    margin-bottom: 2rem; 
+}}
+.sub-header {{ 
+    font-size: 1.5rem; 
+    color: #2c3e50; 
+    margin-bottom: 1rem; 
+}}
+.chat-bubble {{ 
+    border-radius: 18px; 
+    padding: 1rem; 
+    margin: 0.5rem 0; 
+    max-width: 80%; 
+}}
+.chat-bubble.user {{ 
+    background: #e3f2fd; 
+    margin-left: auto; 
+    text-align: right; 
+}}
+.chat-bubble.bot {{ 
+    background: #f0f8ff; 
+    margin-right: auto; 
+    text-align: left; 
+    border-left: 5px solid {brand["primary_color"]}; 
+    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+}}
+.avatar {{ 
+    font-size: 2rem; 
+    vertical-align: middle; 
+    margin-right: 0.5rem; 
+}}
+.progress-bar {{ 
+    height: 20px; 
+    background: #e9ecef; 
+    border-radius: 10px; 
+    overflow: hidden; 
+    margin-bottom: 1rem; 
+}}
+.progress {{ 
+    height: 100%; 
+    background: {brand["primary_color"]}; 
+    transition: width 0.3s; 
+}}
+.feedback-box {{ 
+    background: linear-gradient(135deg, #e8f5e8 0%, #f0f8f0 100%); 
+    border-left: 5px solid {brand["accent_color"]}; 
+    border-radius: 10px; 
+    padding: 1rem; 
+    margin: 1rem 0; 
+    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+}}
+.difficulty-badge {{
+    padding: 0.25rem 0.75rem;
+    border-radius: 20px;
+    font-size: 0.85rem;
+    font-weight: bold;
+    display: inline-block;
+    margin-left: 0.5rem;
+    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+    border: 2px solid rgba(255,255,255,0.3);
+}}
+.summary-box {{ 
+    background: #f1f8e9; 
+    border-left: 5px solid {brand["accent_color"]}; 
+    border-radius: 10px; 
+    padding: 1.5rem; 
+    margin: 2rem 0; 
+}}
+.stButton > button {{ 
+    width: 100%; 
+    background: {brand["primary_color"]}; 
+    color: white; 
+    border-radius: 10px; 
+    padding: 0.5rem 1rem; 
+    font-weight: bold; 
+}}
+.stButton > button:hover {{ 
+    background: {brand["secondary_color"]}; 
+}}
+.voice-button {{
+    background: {brand["secondary_color"]} !important;
+}}
+.role-header h3 {{
+    margin-bottom: 0.5rem;
+}}
+.role-header .difficulty-badge {{
+    margin-left: 1rem;
+}}
+.feedback-box.animated {{
+    animation: fadeIn 0.5s ease-out;
+}}
+@keyframes fadeIn {{
+    from {{ opacity: 0; }}
+    to {{ opacity: 1; }}
+}}
+.follow-up {{
+    border-left: 5px solid {brand["primary_color"]} !important;
+    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+}}
+.feature-showcase {{
+    background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%);
+    border-radius: 15px;
+    padding: 2rem;
+    margin: 2rem 0;
+    text-align: center;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+}}
+.feature-showcase h2 {{
+    color: {brand["primary_color"]};
+    margin-bottom: 1rem;
+}}
+.quick-stats {{
+    background: linear-gradient(135deg, #e3f2fd 0%, #bbdefb 100%);
+    border-radius: 10px;
+    padding: 1.5rem;
+    margin: 1rem 0;
+    border-left: 5px solid {brand["accent_color"]};
+}}
+.hint-box {{
+    background: linear-gradient(135deg, #fff3e0 0%, #ffe0b2 100%);
+    border-left: 5px solid #ff9800;
+    border-radius: 10px;
+    padding: 1rem;
+    margin: 1rem 0;
+    animation: slideIn 0.3s ease-out;
+}}
+@keyframes slideIn {{
+    from {{ transform: translateX(-20px); opacity: 0; }}
+    to {{ transform: translateX(0); opacity: 1; }}
+}}
+.confidence-indicator {{
+    background: linear-gradient(90deg, #ff6b6b 0%, #ffd93d 50%, #6bcf7f 100%);
+    height: 8px;
+    border-radius: 4px;
+    margin: 0.5rem 0;
+}}
+.tech-depth-bar {{
+    background: linear-gradient(90deg, #4fc3f7 0%, #29b6f6 100%);
+    height: 8px;
+    border-radius: 4px;
+    margin: 0.5rem 0;
+}}
+"""
+
+def publish_theme_css(brand, static_dir=STATIC_DIR):
+    """Write the theme stylesheet if its content changed; returns a version for cache busting"""
+    css = build_theme_css(brand)
+    path = os.path.join(static_dir, THEME_CSS_FILE)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            current = f.read()
+    else:
+        current = None
+    if current != css:
+        os.makedirs(static_dir, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(css)
+    return hashlib.sha1(css.encode('utf-8')).hexdigest()[:10]
+
+if __name__ == "__main__":
+    # Build-time generation: python theme.py
+    print(f"Wrote {os.path.join(STATIC_DIR, THEME_CSS_FILE)} (version {publish_theme_css(BRAND_CONFIG)})")
@@ -0,0 +1,177 @@
+import os
+import json
+import atexit
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+RETRY_PAUSE = 1.0  # seconds between attempts at a failing batch
+
+class WriteBehindQueue:
+    """Durable write-behind queue: records are spooled and acknowledged at once, then applied in batches
+
+    Every record is appended (and fsynced) to a JSON-lines spool before submit() returns. A writer
+    thread hands pending (seq, record) pairs to apply_batch in groups of up to batch_size, then records
+    the last applied sequence number in a checkpoint file. On start, spooled records past the checkpoint
+    are replayed, so a crash loses nothing. A batch that raises is retried, and a crash between applying
+    and checkpointing replays it, so apply_batch must skip records at or below the last seq it stored.
+
+    A failing batch is logged and retried one record at a time, so only the failing record is held
+    back; once a record has failed max_attempts times it is moved to a dead-letter file and skipped.
+    """
+    def __init__(self, spool_dir, apply_batch, batch_size=50, flush_interval=0.05, max_attempts=3):
+        os.makedirs(spool_dir, exist_ok=True)
+        self.spool_file = os.path.join(spool_dir, "spool.jsonl")
+        self.checkpoint_file = os.path.join(spool_dir, "checkpoint.json")
+        self.dead_letter_file = os.path.join(spool_dir, "dead_letter.jsonl")
+        self.apply_batch = apply_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._spool_lock = threading.Lock()
+        self._applied_seq = self._read_checkpoint()
+        self._next_seq = self._applied_seq + 1
+        self._closed = False
+        self._flush_waiters = 0
+        self._isolate_through = 0  # Records up to this seq are applied one at a time after a batch failed
+        self._attempts = 0  # Failed attempts at the record at the head of the queue
+        self.last_error = None  # Error of the batch being retried; None while saves are applying
+
+        for seq, record in self._read_spool():
+            if seq > self._applied_seq:
+                self._pending.append((seq, record))
+            self._next_seq = max(self._next_seq, seq + 1)
+
+        self._writer = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _read_checkpoint(self):
+        if not os.path.exists(self.checkpoint_file):
+            return 0
+        with open(self.checkpoint_file, 'r') as f:
+            return json.load(f)['applied_seq']
+
+    def _write_checkpoint(self, seq):
+        tmp_file = self.checkpoint_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump({'applied_seq': seq}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.checkpoint_file)
+
+    def _read_spool(self):
+        if not os.path.exists(self.spool_file):
+            return []
+        entries = []
+        with open(self.spool_file, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # Torn final write; that record was never acknowledged
+                entries.append((entry['seq'], entry['record']))
+        return entries
+
+    def submit(self, record):
+        """Durably spool a record and queue it for the writer; returns its sequence number"""
+        with self._spool_lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            with open(self.spool_file, 'a') as f:
+                f.write(json.dumps({'seq': seq, 'record': record}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        with self._condition:
+            self._pending.append((seq, record))
+            self._condition.notify_all()
+        return seq
+
+    def pending(self):
+        """Number of records spooled but not yet applied"""
+        with self._condition:
+            return self._next_seq - 1 - self._applied_seq
+
+    def flush(self, timeout=None):
+        """Block until every record submitted so far is applied, or a save fails; returns whether all were applied"""
+        if threading.current_thread() is self._writer:
+            return False  # apply_batch reading back through a flushing path; waiting would deadlock
+        with self._condition:
+            target = self._next_seq - 1
+            self._flush_waiters += 1
+            self._condition.notify_all()
+            try:
+                # Saves that keep failing are not waited for; reads go ahead with what is stored
+                self._condition.wait_for(
+                    lambda: self._applied_seq >= target or self._closed or self.last_error is not None, timeout
+                )
+                return self._applied_seq >= target
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout=10):
+        """Apply everything still queued and stop the writer"""
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._writer.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if self._closed and not self._pending:
+                    return
+                # Group commit: give concurrent saves a moment to join the batch, unless someone is waiting
+                self._condition.wait_for(
+                    lambda: len(self._pending) >= self.batch_size or self._flush_waiters or self._closed,
+                    self.flush_interval
+                )
+                size = 1 if self._pending[0][0] <= self._isolate_through else self.batch_size
+                batch = [self._pending.popleft() for _ in range(min(size, len(self._pending)))]
+
+            try:
+                self.apply_batch(batch)
+            except Exception as e:
+                logger.exception("Applying saves %d-%d failed", batch[0][0], batch[-1][0])
+                self._attempts += len(batch) == 1
+                if self._attempts >= self.max_attempts:
+                    self._dead_letter(batch[0], e)
+                else:
+                    # Keep the batch spooled and retry its records one at a time after a pause
+                    with self._condition:
+                        self.last_error = e
+                        self._condition.notify_all()
+                        self._isolate_through = max(self._isolate_through, batch[-1][0])
+                        self._pending.extendleft(reversed(batch))
+                        self._condition.wait(RETRY_PAUSE)
+                    continue
+
+            self._attempts = 0
+            self._write_checkpoint(batch[-1][0])
+            with self._condition:
+                self.last_error = None
+                self._applied_seq = batch[-1][0]
+                self._condition.notify_all()
+            self._compact_spool()
+
+    def _dead_letter(self, entry, error):
+        """Set aside a record that keeps failing, so the records after it can be applied"""
+        seq, record = entry
+        logger.error("Moving save %d to %s after %d failed attempts", seq, self.dead_letter_file, self._attempts)
+        with open(self.dead_letter_file, 'a') as f:
+            f.write(json.dumps({'seq': seq, 'record': record, 'error': repr(error)}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact_spool(self):
+        """Empty the spool once every record in it has been applied"""
+        with self._spool_lock:
+            if self._next_seq - 1 == self._applied_seq:
+                open(self.spool_file, 'w').close()